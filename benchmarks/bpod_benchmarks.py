@@ -0,0 +1,256 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+End-to-end benchmarks of the host stack against the Bpod emulator.
+
+For each combination of state machine size and event rate a Bpod object is connected to a
+:class:`pybpodapi.emulator.BpodEmulator` and a set of trials is run. The results are written as JSON::
+
+    python benchmarks/bpod_benchmarks.py --states 4 32 128 --rates 0 1000 10000 --output results.json
+
+An event rate of 0 runs the emulator as fast as possible, to measure the maximum throughput of the host.
+Other rates are emulated in real time.
+"""
+
+import argparse
+import functools
+import json
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import types
+from datetime import datetime
+
+import numpy as np
+
+from confapp import conf
+
+import pybpodapi
+from pybpodapi.com.transports import MemoryTransport
+from pybpodapi.emulator import BpodEmulator
+from pybpodapi.protocol import Bpod, StateMachine
+from pybpodapi.session import Session
+
+# rate of the emulator clock when it runs as fast as possible (it does not limit the throughput)
+UNTHROTTLED_EVENT_RATE = 1000
+
+
+class Timer(object):
+    """
+    Accumulate the durations (in seconds) of the calls to a function
+    """
+
+    def __init__(self, function):
+        self.function = function
+        self.durations = []
+
+    def __call__(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self.function(*args, **kwargs)
+        finally:
+            self.durations.append(time.perf_counter() - start)
+
+    def __get__(self, obj, objtype=None):
+        # bind like a function when used as a class attribute
+        return self if obj is None else functools.partial(self, obj)
+
+
+class BatchTimer(Timer):
+    """
+    Accumulate the durations of the calls to a method adding a batch of items, and the sizes of the batches
+    """
+
+    def __init__(self, function):
+        Timer.__init__(self, function)
+        self.sizes = []
+
+    def __call__(self, obj, items, *args, **kwargs):
+        self.sizes.append(len(items))
+        return Timer.__call__(self, obj, items, *args, **kwargs)
+
+
+def stats(durations):
+    """
+    Summary of a list of durations, in microseconds
+    """
+    if not durations:
+        return None
+    values = np.array(durations) * 1e6
+    return {
+        "count": len(values),
+        "total_us": float(values.sum()),
+        "mean_us": float(values.mean()),
+        "p50_us": float(np.percentile(values, 50)),
+        "p95_us": float(np.percentile(values, 95)),
+        "p99_us": float(np.percentile(values, 99)),
+        "max_us": float(values.max()),
+    }
+
+
+def create_transports(name):
+    """
+    :return: the transport used by the host and the one used by the emulator
+    """
+    if name == "memory":
+        return MemoryTransport.pair()
+    elif name == "pty":
+        from pybpodapi.com.transports import PtyTransport
+
+        device = PtyTransport()
+        return device.slave_name, device
+    raise ValueError("Unknown transport: {0}".format(name))
+
+
+def build_state_machine(bpod, n_states, state_timer):
+    """
+    Chain of states moving forward on each Port1In, the last one exits.
+    The trial receives two events (Port1In, Port1Out) per state.
+    """
+    sma = StateMachine(bpod)
+    for i in range(n_states - 1):
+        sma.add_state(
+            state_name="State{0}".format(i),
+            state_timer=state_timer,
+            state_change_conditions={"Port1In": "State{0}".format(i + 1), "Tup": "exit"},
+            output_actions=[("PWM1", 255)],
+        )
+    sma.add_state(
+        state_name="State{0}".format(n_states - 1),
+        state_timer=0,
+        state_change_conditions={"Tup": "exit"},
+        output_actions=[],
+    )
+    return sma
+
+
+def run_case(n_states, event_rate, n_trials, transport, live_timestamps):
+    """
+    Run n_trials state machines with n_states states, at the given event rate, and measure the host.
+    """
+    host, device = create_transports(transport)
+    realtime = event_rate > 0
+    emulator = BpodEmulator(
+        device,
+        event_rate=event_rate if realtime else UNTHROTTLED_EVENT_RATE,
+        live_timestamps=live_timestamps,
+        realtime=realtime,
+    ).start()
+
+    workspace = tempfile.mkdtemp(prefix="pybpod-benchmark-")
+    session_add = Timer(Session.__add__)
+    Session.__add__ = session_add
+    # the state occurrences and the events summaries of a trial are added together
+    session_add_messages = BatchTimer(Session.add_messages)
+    Session.add_messages = session_add_messages
+    try:
+        bpod = Bpod(serial_port=host, workspace_path=workspace, session_name="benchmark")
+
+        # the private methods are looked up on the instance, so they can be wrapped there
+        process_opcode = bpod._BpodBase__process_opcode = Timer(bpod._BpodBase__process_opcode)
+        update_timestamps = bpod._BpodBase__update_timestamps = Timer(bpod._BpodBase__update_timestamps)
+        upload = bpod._bpodcom_send_state_machine = Timer(bpod._bpodcom_send_state_machine)
+        send = Timer(bpod.send_state_machine)
+        run = Timer(bpod.run_state_machine)
+
+        # the state timer must not expire before the next Port1In
+        state_timer = 10.0 / (event_rate if realtime else UNTHROTTLED_EVENT_RATE)
+
+        n_session_messages = len(session_add.durations)
+        session_add.durations = []
+        session_add_messages.durations = []
+        session_add_messages.sizes = []
+        events_before = emulator.n_events
+        for _ in range(n_trials):
+            sma = build_state_machine(bpod, n_states, state_timer)
+            send(sma)
+            run(sma)
+        n_events = emulator.n_events - events_before
+
+        bpod.close()
+    finally:
+        Session.__add__ = session_add.function
+        Session.add_messages = session_add_messages.function
+        emulator.stop()
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    build = [s - u for s, u in zip(send.durations, upload.durations)]
+    run_time = sum(run.durations)
+    session_logging_time = sum(session_add.durations) + sum(session_add_messages.durations)
+
+    return {
+        "n_states": n_states,
+        "event_rate": event_rate,
+        "n_trials": n_trials,
+        "n_events": n_events,
+        "run_state_machine": {
+            "events_per_second": n_events / run_time if run_time else None,
+            "trial": stats(run.durations),
+        },
+        "process_opcode": stats(process_opcode.durations),
+        "send_state_machine": {
+            "build": stats(build),
+            "upload": stats(upload.durations),
+            "total": stats(send.durations),
+        },
+        "update_timestamps": stats(update_timestamps.durations),
+        "session_logging": {
+            "messages": stats(session_add.durations),
+            "batches": stats(session_add_messages.durations),
+            # messages added in batches, e.g. the events summaries when the timestamps are not live
+            "batched_messages": sum(session_add_messages.sizes),
+            "fraction_of_run_time": session_logging_time / run_time if run_time else None,
+            "setup_messages": n_session_messages,
+        },
+    }
+
+
+def main():
+    global conf
+
+    parser = argparse.ArgumentParser(description="PyBpod API host benchmarks")
+    parser.add_argument("--states", type=int, nargs="+", default=[4, 32, 128], help="state machine sizes")
+    parser.add_argument("--rates", type=float, nargs="+", default=[0, 1000], help="event rates (events per second, 0 = unthrottled)")
+    parser.add_argument("--trials", type=int, default=20, help="trials per case")
+    parser.add_argument("--transport", choices=["memory", "pty"], default="memory")
+    parser.add_argument("--no-live-timestamps", action="store_true", help="emulate a device sending timestamps at the end of the trials")
+    parser.add_argument("--event-driven", action="store_true", help="use the event driven loop (PYBPOD_API_EVENT_DRIVEN_LOOP)")
+    parser.add_argument("--output", default=None, help="JSON output file (default: stdout)")
+    args = parser.parse_args()
+
+    # settings module with the highest priority, overriding the user settings
+    benchmark_settings = types.ModuleType("benchmark_settings")
+    benchmark_settings.SETTINGS_PRIORITY = 0
+    benchmark_settings.PYBPOD_API_STREAM2STDOUT = False
+    benchmark_settings.PYBPOD_API_EVENT_DRIVEN_LOOP = args.event_driven
+    conf += benchmark_settings
+
+    results = []
+    for n_states in args.states:
+        for event_rate in args.rates:
+            print("Running {0} states at {1} events/s...".format(n_states, event_rate or "unthrottled"), file=sys.stderr)
+            results.append(run_case(n_states, event_rate, args.trials, args.transport, not args.no_live_timestamps))
+
+    report = {
+        "date": datetime.now().isoformat(),
+        "pybpodapi_version": pybpodapi.__version__,
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "transport": args.transport,
+        "live_timestamps": not args.no_live_timestamps,
+        "event_driven_loop": args.event_driven,
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as outfile:
+            json.dump(report, outfile, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == "__main__":
+    main()
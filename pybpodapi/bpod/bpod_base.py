@@ -5,6 +5,7 @@ import logging
 import math
 import socket
 import sys
+import threading
 
 from confapp import conf as settings
 from datetime import datetime as datetime_now
@@ -72,8 +73,13 @@ class BpodBase(object):
         self.bpod_start_timestamp = None
 
         self._new_sma_sent = False         # type: bool
+        self._run_asap_sent = False        # type: bool
+        self._installed_sma = None         # type: bytes
         self._skip_all_trials = False
 
+        # set by the serial reader, stdin and socket threads to wake up the event driven loop
+        self._wakeup = threading.Event()
+
         self._hardware.sync_channel = self.sync_channel  # 255 = no sync, otherwise set to a hardware channel number
         self._hardware.sync_mode = self.sync_mode    # 0 = flip logic every trial, 1 = every state
 
@@ -131,6 +137,10 @@ class BpodBase(object):
 
         logger.info("Starting Bpod")
 
+        # the state machine installed on the device is unknown
+        self._installed_sma = None
+        self._run_asap_sent = False
+
         self._bpodcom_connect(self.serial_port, self.baudrate)
 
         if not self._bpodcom_handshake():
@@ -167,13 +177,13 @@ class BpodBase(object):
         if self.net_port is not None:
             self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
             self.sock.bind(('0.0.0.0', self.net_port))
-            self.socketin = NonBlockingSocketReceive(self.sock)
+            self.socketin = NonBlockingSocketReceive(self.sock, self._wakeup)
         else:
             self.sock = None
             self.socketin = None
 
         # initialise the thread that will handle the stdin commands
-        self.stdin = NonBlockingStreamReader(sys.stdin) if settings.PYBPOD_API_ACCEPT_STDIN else None
+        self.stdin = NonBlockingStreamReader(sys.stdin, self._wakeup) if settings.PYBPOD_API_ACCEPT_STDIN else None
         #####################################################
 
         return self
@@ -190,6 +200,7 @@ class BpodBase(object):
 
         self._bpodcom_disconnect()
 
+        self._session.close()
         del self._session
 
         if self.socketin is not None:
@@ -220,7 +231,14 @@ class BpodBase(object):
         """
         Builds message and sends state machine to Bpod
 
+        If the setting ``PYBPOD_API_CACHE_STATE_MACHINE`` is enabled and the message is identical to the one of the
+        state machine already installed on Bpod, the upload is skipped and the installed state machine is run again.
+
+        If run_asap is set, Bpod runs the state machine as soon as the current trial ends (or immediately if no trial is
+        running), and :meth:`run_state_machine` does not send the run command. See also :meth:`run_trials`.
+
         :param pybpodapi.model.state_machine sma: initialized state machine
+        :param run_asap: if not None, run the state machine as soon as possible
         """
         if not self.bpod_com_ready:
             raise Exception('Bpod connection is closed')
@@ -231,12 +249,22 @@ class BpodBase(object):
         logger.info("Sending state machine")
 
         sma.update_state_numbers()
+        sma.build_transitions_table()
+
+        state_machine_body = sma.build_body()
 
-        state_machine_body = sma.build_message() + sma.build_message_global_timer() + sma.build_message_32_bits()
+        # the header carries the back signal flag, which is part of the installed state machine
+        installed_sma = sma.build_header(None, len(state_machine_body)) + state_machine_body
+
+        if settings.PYBPOD_API_CACHE_STATE_MACHINE and run_asap is None and installed_sma == self._installed_sma:
+            logger.debug("State machine already installed, skipping the upload")
+            return
 
         self._bpodcom_send_state_machine(sma.build_header(run_asap, len(state_machine_body)) + state_machine_body)
 
         self._new_sma_sent = True
+        self._run_asap_sent = run_asap is not None
+        self._installed_sma = installed_sma
 
     def run_state_machine(self, sma):
         """
@@ -259,6 +287,73 @@ class BpodBase(object):
 
         :param (:class:`pybpodapi.state_machine.StateMachine`) sma: initialized state machine
         """
+        return self.__run_state_machine(sma)
+
+    def run_trials(self, sma_factory, n_trials):
+        """
+        Run a sequence of trials without dead time between them.
+
+        The state machine of the next trial is built and sent, to run as soon as possible, just after the current trial
+        starts. Bpod starts it as soon as the current trial ends, while the host processes the events of the ended
+        trial.
+
+        Example:
+
+        .. code-block:: python
+
+            def build_trial(trial_index):
+                sma = StateMachine(my_bpod)
+                sma.add_state(state_name='Reward', state_timer=rewards[trial_index], state_change_conditions={'Tup': 'exit'}, output_actions=[('Valve', 1)])
+                return sma
+
+            my_bpod.run_trials(build_trial, 100)
+
+        :param sma_factory: function called with the index of a trial (starting at 0) that returns its state machine
+        :param int n_trials: number of trials to run
+        :return: number of trials run until the end or an interruption
+        :rtype: int
+        """
+        if n_trials <= 0:
+            return 0
+
+        sma = sma_factory(0)
+        self.send_state_machine(sma)
+
+        for trial_index in range(n_trials):
+            next_trial = []
+
+            def send_next_trial():
+                if trial_index + 1 < n_trials:
+                    next_trial.append(sma_factory(trial_index + 1))
+                    self.send_state_machine(next_trial[0], run_asap=True)
+
+            if not self.__run_state_machine(sma, send_next_trial):
+                if self.bpod_com_ready:
+                    self.__discard_trial(sma)
+                    if next_trial:
+                        # Bpod started the next trial when the interrupted one ended
+                        self.stop_trial()
+                        self._bpodcom_state_machine_installation_status()
+                        self._bpodcom_get_trial_timestamp_start()
+                        next_trial[0].is_running = True
+                        self.__discard_trial(next_trial[0])
+                self._new_sma_sent = False
+                self._run_asap_sent = False
+                return trial_index
+
+            if not next_trial:
+                break
+            sma = next_trial[0]
+
+        return n_trials
+
+    def __run_state_machine(self, sma, on_trial_start=None):
+        """
+        Run a state machine, see :meth:`run_state_machine`
+
+        :param sma: initialized state machine
+        :param on_trial_start: function called once the trial started on Bpod, before processing its events
+        """
         if not self.bpod_com_ready:
             raise Exception('Bpod connection is closed')
 
@@ -271,11 +366,17 @@ class BpodBase(object):
 
         self.trial_timestamps = []  # Store the trial timestamps in case bpod is using live_timestamps
 
-        self._bpodcom_run_state_machine()
+        if self._run_asap_sent:
+            # Bpod runs the state machine by itself
+            self._run_asap_sent = False
+        else:
+            self._bpodcom_run_state_machine()
+
         if self._new_sma_sent:
             if self._bpodcom_state_machine_installation_status():
                 self._new_sma_sent = False
             else:
+                self._installed_sma = None
                 raise BpodErrorException('Error: The last state machine sent was not acknowledged by the Bpod device.', self)
 
         self.trial_start_timestamp = self._bpodcom_get_trial_timestamp_start()
@@ -283,6 +384,9 @@ class BpodBase(object):
         if self.bpod_start_timestamp is None:
             self.bpod_start_timestamp = self.trial_start_timestamp
 
+        if on_trial_start is not None:
+            on_trial_start()
+
         #####################################################
         # create a list of executed states
         state_change_indexes = []
@@ -291,9 +395,18 @@ class BpodBase(object):
         interrupt_task = False
         kill_task = False
 
+        event_driven = settings.PYBPOD_API_EVENT_DRIVEN_LOOP
+        loop_period = settings.PYBPOD_API_LOOP_HANDLER_PERIOD
+
         sma.is_running = True
         while sma.is_running:
 
+            # sleep until serial data, a command or the next loop_handler call is due
+            if event_driven:
+                if not self.data_available():
+                    self._wakeup.wait(loop_period)
+                self._wakeup.clear()
+
             # read commands from the stdin ######################
             if self.stdin is not None:
                 inline = self.stdin.readline()
@@ -334,6 +447,25 @@ class BpodBase(object):
 
         return not interrupt_task
 
+    def __discard_trial(self, sma):
+        """
+        Read and discard the remaining messages of a stopped trial, until its end timestamps
+
+        :param sma: state machine of the trial
+        """
+        while sma.is_running:
+            opcode, data = self._bpodcom_read_opcode_message()
+            if opcode == 1:
+                events = self._bpodcom_read_current_events(data)
+                if self.hardware.live_timestamps:
+                    self._bpodcom_read_event_timestamp()
+                if 255 in events:
+                    sma.is_running = False
+
+        self._bpodcom_read_timestamps()
+        if not self.hardware.live_timestamps:
+            self._bpodcom_read_alltimestamps()
+
     def handle_inline(self, inline, sma):
         interrupt_task = False
         kill_task = False
@@ -357,14 +489,14 @@ class BpodBase(object):
             chn_name = tdata[1]
             evt_data = tdata[2]
             # TODO: surround this call in a try except to capture calls with unavailable channel names
-            channel_number = sma.hardware.channels.input_channel_names.index(chn_name)
+            channel_number = sma.hardware.channels.get_input_channel_index(chn_name)
             self.trigger_input(channel_number, evt_data)
         elif inline.startswith('trigger_output:'):
             tdata = inline.split(':')
             chn_name = tdata[1]
             evt_data = tdata[2]
             # TODO: surround this call in a try except to capture calls with unavailable channel names
-            channel_number = sma.hardware.channels.output_channel_names.index(chn_name)
+            channel_number = sma.hardware.channels.get_output_channel_index(chn_name)
             self.trigger_output(channel_number, evt_data)
         elif inline.startswith('message:'):
             tdata = inline.split(':')
@@ -458,6 +590,7 @@ class BpodBase(object):
             n_current_events = data
             current_events = self._bpodcom_read_current_events(n_current_events)
             transition_event_found = False
+            transitions_table = sma.transitions_table
 
             if self.hardware.live_timestamps:
                 event_timestamp = self._bpodcom_read_event_timestamp()
@@ -475,71 +608,19 @@ class BpodBase(object):
                     )
                     self.trial_timestamps.append(event_timestamp)
 
-                    # input matrix
+                    # state tracking, see StateMachineRunner.build_transitions_table
                     if not transition_event_found:
-                        logger.debug("transition event not found")
-                        logger.debug("Current state: %s", sma.current_state)
-                        for transition in sma.input_matrix[sma.current_state]:
-                            logger.debug("Transition: %s", transition)
-                            if transition[0] == event_id:
-                                if sma.use_255_back_signal and transition[1] == 255:
-                                    sma.current_state = current_trial.states[-2]
-                                else:
-                                    sma.current_state = transition[1]
-
-                                if not math.isnan(sma.current_state):
-                                    logger.debug("adding states input matrix")
-                                    current_trial.states.append(sma.current_state)
-                                    state_change_indexes.append(len(current_trial.events_occurrences) - 1)
-
-                                transition_event_found = True
-
-                    # state timer matrix
-                    if not transition_event_found:
-                        this_state_timer_transition = sma.state_timer_matrix[sma.current_state]
-                        if event_id == sma.hardware.channels.events_positions.Tup:
-                            if not (this_state_timer_transition == sma.current_state):
-                                if sma.use_255_back_signal and this_state_timer_transition == 255:
-                                    sma.current_state = current_trial.states[-2]
-                                else:
-                                    sma.current_state = this_state_timer_transition
-
-                                if not math.isnan(sma.current_state):
-                                    logger.debug("adding states state timer matrix")
-                                    current_trial.states.append(sma.current_state)
-                                    state_change_indexes.append(len(current_trial.events_occurrences) - 1)
-                                transition_event_found = True
-
-                    # global timers start matrix
-                    if not transition_event_found:
-                        for transition in sma.global_timers.start_matrix[sma.current_state]:
-                            if transition[0] == event_id:
-                                if sma.use_255_back_signal and transition[1] == 255:
-                                    sma.current_state = current_trial.states[-2]
-                                else:
-                                    sma.current_state = transition[1]
-
-                                if not math.isnan(sma.current_state):
-                                    logger.debug("adding states global timers start matrix")
-                                    current_trial.states.append(sma.current_state)
-                                    state_change_indexes.append(len(current_trial.events_occurrences) - 1)
-                                transition_event_found = True
-
-                    # global timers end matrix
-                    if not transition_event_found:
-                        for transition in sma.global_timers.end_matrix[sma.current_state]:
-                            if transition[0] == event_id:
-
-                                if sma.use_255_back_signal and transition[1] == 255:
-                                    sma.current_state = current_trial.states[-2]
-                                else:
-                                    sma.current_state = transition[1]
-
-                                if not math.isnan(sma.current_state):
-                                    logger.debug("adding states global timers end matrix")
-                                    current_trial.states.append(sma.current_state)
-                                    state_change_indexes.append(len(current_trial.events_occurrences) - 1)
-                                transition_event_found = True
+                        destination = transitions_table[sma.current_state].get(event_id)
+                        if destination is not None:
+                            if sma.use_255_back_signal and destination == 255:
+                                sma.current_state = current_trial.states[-2]
+                            else:
+                                sma.current_state = destination
+
+                            if not math.isnan(sma.current_state):
+                                current_trial.states.append(sma.current_state)
+                                state_change_indexes.append(len(current_trial.events_occurrences) - 1)
+                            transition_event_found = True
 
                 logger.debug("States indexes: %s", current_trial.states)
 
@@ -579,14 +660,15 @@ class BpodBase(object):
         if self.hardware.live_timestamps:
             timestamps = self.trial_timestamps
         else:
-            timestamps = self._bpodcom_read_alltimestamps()
-            timestamps = [float(t)*self._hardware.times_scale_factor for t in timestamps]
+            timestamps = self._bpodcom_read_alltimestamps(as_numpy=True)
+            timestamps = (timestamps * self._hardware.times_scale_factor).tolist()
 
             # update the timestamps of the events #############################################################
+            events_resumes = []
             for event, timestamp in zip(current_trial.events_occurrences, timestamps):
                 event.host_timestamp = timestamp
-                e = EventResume(event.event_id, event.event_name, host_timestamp=timestamp)
-                self.session += e
+                events_resumes.append(EventResume(event.event_id, event.event_name, host_timestamp=timestamp))
+            self.session.add_messages(events_resumes)
             ###################################################################################################
 
         current_trial.event_timestamps = timestamps
@@ -8,6 +8,7 @@ from pybpodapi.bpod.bpod_base import BpodBase
 from pybpodapi.bpod.hardware.channels import ChannelType
 from pybpodapi.bpod_modules.bpod_module import BpodModule
 from pybpodapi.com.arcom import ArCOM, ArduinoTypes
+from pybpodapi.com.protocol.command_frames import CommandFrames
 from pybpodapi.com.protocol.recv_msg_headers import ReceiveMessageHeader
 from pybpodapi.com.protocol.send_msg_headers import SendMessageHeader
 from pybpodapi.exceptions.bpod_error import BpodErrorException
@@ -63,7 +64,7 @@ class BpodCOMProtocol(BpodBase):
         """
         if channel_type == ChannelType.INPUT:
             input_channel_name = channel_name + str(channel_number)
-            channel_number = self.hardware.channels.input_channel_names.index(input_channel_name)
+            channel_number = self.hardware.channels.get_input_channel_index(input_channel_name)
             try:
                 self._bpodcom_override_input_state(channel_number, value)
             except:
@@ -77,7 +78,7 @@ class BpodCOMProtocol(BpodBase):
             else:
                 try:
                     output_channel_name = channel_name + str(channel_number)
-                    channel_number = self.hardware.channels.output_channel_names.index(output_channel_name)
+                    channel_number = self.hardware.channels.get_output_channel_index(output_channel_name)
                     self._bpodcom_override_digital_hardware_state(channel_number, value)
                 except:
                     raise BpodErrorException('Error using manual_override: {name} is not a valid channel name.'.format(
@@ -85,16 +86,44 @@ class BpodCOMProtocol(BpodBase):
         else:
             raise BpodErrorException('Error using manualOverride: first argument must be "Input" or "Output".')
 
+    def batch(self):
+        """
+        Context in which the commands are queued and sent to Bpod in a single write when it exits.
+
+        Example:
+
+        .. code-block:: python
+
+            with my_bpod.batch():
+                my_bpod.manual_override(Bpod.ChannelTypes.OUTPUT, Bpod.ChannelNames.PWM, 1, 255)
+                my_bpod.manual_override(Bpod.ChannelTypes.OUTPUT, Bpod.ChannelNames.VALVE, 1, 1)
+                my_bpod.trigger_softcode(3)
+        """
+        return self._arcom.batch()
+
     def _bpodcom_connect(self, serial_port, baudrate=115200, timeout=1):
         """
-        Connect to Bpod using serial connection
+        Connect to Bpod using serial connection (or other transport, see PYBPOD_TRANSPORT setting)
 
-        :param str serial_port: serial port to connect
+        :param serial_port: serial port to connect, transport url or transport object
         :param int baudrate: baudrate for serial connection
         :param float timeout: timeout which controls the behavior of read()
         """
         logger.debug("Connecting on port: %s", serial_port)
-        self._arcom = ArCOM().open(serial_port, baudrate, timeout)
+        # the event driven loop is woken up by the serial reader thread
+        event_driven = settings.PYBPOD_API_EVENT_DRIVEN_LOOP
+
+        self._arcom = ArCOM().open(
+            serial_port,
+            baudrate,
+            timeout,
+            threaded=settings.PYBPOD_API_SERIAL_READER_THREAD or event_driven,
+            buffer_size=settings.PYBPOD_API_SERIAL_BUFFER_SIZE,
+            wakeup=self._wakeup if event_driven else None,
+            transport=settings.PYBPOD_TRANSPORT,
+            capture_file=settings.PYBPOD_API_CAPTURE_FILE,
+            coalesce_delay=settings.PYBPOD_API_COALESCE_WRITES_DELAY,
+        )
 
     def _bpodcom_disconnect(self):
         """
@@ -171,25 +200,26 @@ class BpodCOMProtocol(BpodBase):
         Pause ongoing trial (We recommend using computer-side pauses between trials, to keep data uniform)
         """
         logger.debug("Pausing trial")
-        bytes2send = ArduinoTypes.get_uint8_array([ord(SendMessageHeader.PAUSE_TRIAL), 0])
-        self._arcom.write_array(bytes2send)
+        self._arcom.write_array(CommandFrames.PAUSE_TRIAL.pack(0))
 
     def _bpodcom_resume_trial(self):
         """
         Resumes ongoing trial (We recommend using computer-side pauses between trials, to keep data uniform)
         """
         logger.debug("Resume trial")
-        bytes2send = ArduinoTypes.get_uint8_array([ord(SendMessageHeader.PAUSE_TRIAL), 1])
-        self._arcom.write_array(bytes2send)
+        self._arcom.write_array(CommandFrames.PAUSE_TRIAL.pack(1))
 
     def _bpodcom_get_timestamp_transmission(self):
         """
         Return timestamp transmission scheme
+
+        :return: True if the timestamps are sent with each event, False if they are sent at the end of the trial
+        :rtype: bool
         """
         logger.debug("Get timestamp transmission")
 
         self._arcom.write_char(SendMessageHeader.GET_TIMESTAMP_TRANSMISSION)
-        return self._arcom.read_byte()
+        return self._arcom.read_uint8() == 1
 
     def _bpodcom_hardware_description(self, hardware):
         """
@@ -287,9 +317,7 @@ class BpodCOMProtocol(BpodBase):
 
         logger.debug("Requesting sync channel and mode (%s)", SendMessageHeader.SYNC_CHANNEL_MODE)
 
-        bytes2send = ArduinoTypes.get_uint8_array([ord(SendMessageHeader.SYNC_CHANNEL_MODE), sync_channel, sync_mode])
-
-        self._arcom.write_array(bytes2send)
+        self._arcom.write_array(CommandFrames.SYNC_CHANNEL_MODE.pack(sync_channel, sync_mode))
 
         response = self._arcom.read_uint8()  # type: int
 
@@ -302,19 +330,14 @@ class BpodCOMProtocol(BpodBase):
         Send soft code
         """
         logger.debug("Echo softcode")
-        self._arcom.write_char(SendMessageHeader.ECHO_SOFTCODE)
-        self._arcom.write_char(softcode)
-
-        bytes2send = ArduinoTypes.get_uint8_array([ord(SendMessageHeader.ECHO_SOFTCODE), softcode])
-        self._arcom.write_array(bytes2send)
+        self._arcom.write_array(CommandFrames.ECHO_SOFTCODE.pack(softcode))
 
     def _bpodcom_manual_override_exec_event(self, event_index, event_data):
         """
         Send soft code
         """
         logger.debug("Manual override execute virtual event")
-        bytes2send = ArduinoTypes.get_uint8_array([ord(SendMessageHeader.MANUAL_OVERRIDE_EXEC_EVENT), event_index, event_data])
-        self._arcom.write_array(bytes2send)
+        self._arcom.write_array(CommandFrames.MANUAL_OVERRIDE_EXEC_EVENT.pack(event_index, event_data))
 
     def _bpodcom_override_input_state(self, channel_number, value):
         """
@@ -325,17 +348,14 @@ class BpodCOMProtocol(BpodBase):
         """
         logger.debug("Override input state")
 
-        bytes2send = ArduinoTypes.get_uint8_array(
-            [ord(SendMessageHeader.MANUAL_OVERRIDE_EXEC_EVENT), channel_number, value])
-        self._arcom.write_array(bytes2send)
+        self._arcom.write_array(CommandFrames.MANUAL_OVERRIDE_EXEC_EVENT.pack(channel_number, value))
 
     def _bpodcom_send_softcode(self, softcode):
         """
         Send soft code
         """
         logger.debug("Send softcode")
-        bytes2send = ArduinoTypes.get_uint8_array([ord(SendMessageHeader.TRIGGER_SOFTCODE), softcode])
-        self._arcom.write_array(bytes2send)
+        self._arcom.write_array(CommandFrames.TRIGGER_SOFTCODE.pack(softcode))
 
     def _bpodcom_send_state_machine(self, message):
         """
@@ -429,17 +449,18 @@ class BpodCOMProtocol(BpodBase):
 
         return opcode, data
 
-    def _bpodcom_read_alltimestamps(self):
+    def _bpodcom_read_alltimestamps(self, as_numpy=False):
         """
         A new incoming timestamps message is available.
         Read number of timestamps to be sent and then read timestamps array.
 
+        :param bool as_numpy: return a numpy array instead of a list
         :return: timestamps array
-        :rtype: list(float)
+        :rtype: list(int)
         """
         n_timestamps = self._arcom.read_uint16()  # type: int
 
-        timestamps = self._arcom.read_uint32_array(array_len=n_timestamps)
+        timestamps = self._arcom.read_uint32_array(array_len=n_timestamps, as_numpy=as_numpy)
 
         logger.debug("Received timestamps: %s", timestamps)
 
@@ -523,9 +544,7 @@ class BpodCOMProtocol(BpodBase):
         :param int value: value to be written
         """
 
-        bytes2send = ArduinoTypes.get_uint8_array(
-            [ord(SendMessageHeader.OVERRIDE_DIGITAL_HW_STATE), channel_number, value])
-        self._arcom.write_array(bytes2send)
+        self._arcom.write_array(CommandFrames.OVERRIDE_DIGITAL_HW_STATE.pack(channel_number, value))
 
     def _bpodcom_send_byte_to_hardware_serial(self, channel_number, value):
         """
@@ -534,10 +553,7 @@ class BpodCOMProtocol(BpodBase):
         :param int channel_number:
         :param int value: value to be written
         """
-        bytes2send = ArduinoTypes.get_uint8_array(
-            [ord(SendMessageHeader.SEND_TO_HW_SERIAL), channel_number, value]
-        )
-        self._arcom.write_array(bytes2send)
+        self._arcom.write_array(CommandFrames.SEND_TO_HW_SERIAL.pack(channel_number, value))
 
     @property
     def hardware(self):
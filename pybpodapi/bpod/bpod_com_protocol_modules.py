@@ -8,6 +8,7 @@ import numpy as np
 from pybpodapi.com.arcom import ArduinoTypes
 from pybpodapi.bpod_modules.bpod_modules import BpodModules
 from pybpodapi.bpod.bpod_com_protocol import BpodCOMProtocol
+from pybpodapi.com.protocol.command_frames import CommandFrames
 from pybpodapi.com.protocol.send_msg_headers import SendMessageHeader
 from pybpodapi.com.protocol.recv_msg_headers import ReceiveMessageHeader
 from pybpodapi.exceptions.bpod_error import BpodErrorException
@@ -139,14 +140,10 @@ class BpodCOMProtocolModules(BpodCOMProtocol):
         return bpod_modules
 
     def _bpodcom_activate_module_relay(self, module_index):
-        self._arcom.write_array(
-            [ord(SendMessageHeader.SET_MODULE_RELAY), module_index, 1]
-        )
+        self._arcom.write_array(CommandFrames.SET_MODULE_RELAY.pack(module_index, 1))
 
     def _bpodcom_deactivate_module_relay(self, module_index):
-        self._arcom.write_array(
-            [ord(SendMessageHeader.SET_MODULE_RELAY), module_index, 0]
-        )
+        self._arcom.write_array(CommandFrames.SET_MODULE_RELAY.pack(module_index, 0))
 
     def _bpodcom_clean_any_data_in_the_buffer(self):
         n_bytes_available = self.bytes_available()
@@ -171,10 +168,7 @@ class BpodCOMProtocolModules(BpodCOMProtocol):
                 "Error: module messages must be under 64 bytes per transmission"
             )
 
-        to_send = [ord(SendMessageHeader.WRITE_TO_MODULE), module_index + 1, len(msg)]
-        to_send = ArduinoTypes.get_uint8_array(to_send)
-
-        self._arcom.write_array(to_send + msg)
+        self._arcom.write_array(CommandFrames.WRITE_TO_MODULE.pack(module_index + 1, len(msg)) + msg)
 
     def _bpodcom_module_read(self, module_index, size, dtype=None):
         if dtype is None:
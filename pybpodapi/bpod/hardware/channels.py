@@ -77,6 +77,11 @@ class Channels(object):
         self.output_channel_names = []
         self.events_positions = EventsPositions()
 
+        # name -> index maps, rebuilt at the end of each setup method
+        self._event_indexes = {}
+        self._input_channel_indexes = {}
+        self._output_channel_indexes = {}
+
     def setup_input_channels(self, hardware, modules):
         """
         Generate event and input channel names
@@ -173,6 +178,9 @@ class Channels(object):
         self.events_positions.Tup = Pos
         Pos += 1
 
+        self._event_indexes = self.__build_index(self.event_names)
+        self._input_channel_indexes = self.__build_index(self.input_channel_names)
+
         logger.debug("event_names: %s", self.event_names)
         logger.debug("events_positions: %s", self.events_positions)
 
@@ -235,8 +243,59 @@ class Channels(object):
         self.events_positions.globalTimerCancel = len(self.output_channel_names) - 1
         self.output_channel_names += ["GlobalCounterReset"]
 
+        self._output_channel_indexes = self.__build_index(self.output_channel_names)
+
         logger.debug("output_channel_names: %s", self.output_channel_names)
 
+    def get_event_index(self, event_name):
+        """
+        Index of an event
+
+        :param str event_name: event name (e.g. 'Port1In')
+        :rtype: int
+        :raises ValueError: if there is no event with this name
+        """
+        try:
+            return self._event_indexes[event_name]
+        except (KeyError, TypeError):
+            raise ValueError("{0} is not an event name".format(event_name))
+
+    def get_input_channel_index(self, channel_name):
+        """
+        Index of an input channel
+
+        :param str channel_name: input channel name (e.g. 'Port1')
+        :rtype: int
+        :raises ValueError: if there is no input channel with this name
+        """
+        try:
+            return self._input_channel_indexes[channel_name]
+        except (KeyError, TypeError):
+            raise ValueError("{0} is not an input channel name".format(channel_name))
+
+    def get_output_channel_index(self, channel_name):
+        """
+        Index of an output channel
+
+        :param str channel_name: output channel name (e.g. 'PWM1')
+        :rtype: int
+        :raises ValueError: if there is no output channel with this name
+        """
+        try:
+            return self._output_channel_indexes[channel_name]
+        except (KeyError, TypeError):
+            raise ValueError("{0} is not an output channel name".format(channel_name))
+
+    @staticmethod
+    def __build_index(names):
+        """
+        Map each name to its first position in the list, as list.index does
+        """
+        indexes = {}
+        for idx, name in enumerate(names):
+            indexes.setdefault(name, idx)
+        return indexes
+
     def get_event_name(self, event_idx):
         """
 
@@ -4,20 +4,22 @@ import socket
 
 
 class NonBlockingSocketReceive:
-    def __init__(self, sck):
+    def __init__(self, sck, wakeup=None):
         """
         stream: the stream to read from.
                 Usually a process' stdout or stderr.
+        wakeup: optional threading.Event set whenever a new datagram is available.
         """
         self._s = sck
         self._q = Queue()
 
         class PopulateQueue(Thread):
-            def __init__(self, sck, queue):
+            def __init__(self, sck, queue, wakeup):
                 Thread.__init__(self)
                 self.daemon = True
                 self.socket = sck
                 self.queue = queue
+                self.wakeup = wakeup
                 self.event = Event()
 
             def run(self):
@@ -38,6 +40,8 @@ class NonBlockingSocketReceive:
                             pass
                         if data:
                             self.queue.put(data)
+                            if self.wakeup is not None:
+                                self.wakeup.set()
                             data = None
 
                         self.event.wait(0.01)
@@ -45,7 +49,7 @@ class NonBlockingSocketReceive:
                 except OSError:
                     self.event.set()
 
-        self._t = PopulateQueue(self._s, self._q)
+        self._t = PopulateQueue(self._s, self._q, wakeup)
         self._t.daemon = True
         self._t.start()  # start collecting lines from the stream
 
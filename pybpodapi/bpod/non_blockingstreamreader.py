@@ -8,10 +8,11 @@ if platform in ["linux", "linux2", "darwin"]:
 
 
 class NonBlockingStreamReader:
-    def __init__(self, stream):
+    def __init__(self, stream, wakeup=None):
         """
         stream: the stream to read from.
                 Usually a process' stdout or stderr.
+        wakeup: optional threading.Event set whenever a new line is available.
         """
         self._s = stream
         self._q = Queue()
@@ -22,11 +23,12 @@ class NonBlockingStreamReader:
             fcntl.fcntl(fd, fcntl.F_SETFL, fl | os.O_NONBLOCK)
 
         class PopulateQueue(Thread):
-            def __init__(self, stream, queue):
+            def __init__(self, stream, queue, wakeup):
                 Thread.__init__(self)
                 self.daemon = True
                 self.stream = stream
                 self.queue = queue
+                self.wakeup = wakeup
                 self.event = Event()
 
             def run(self):
@@ -36,10 +38,12 @@ class NonBlockingStreamReader:
                     line = self.stream.readline()
                     if line:
                         self.queue.put(line)
+                        if self.wakeup is not None:
+                            self.wakeup.set()
                         lines = None
                     self.event.wait(0.01)
 
-        self._t = PopulateQueue(self._s, self._q)
+        self._t = PopulateQueue(self._s, self._q, wakeup)
         self._t.daemon = True
         self._t.start()  # start collecting lines from the stream
 
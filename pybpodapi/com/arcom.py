@@ -2,9 +2,13 @@
 # -*- coding: utf-8 -*-
 
 import logging
-import serial
 import numpy as np
 import struct
+from contextlib import contextmanager
+
+from pybpodapi.com.serial_reader import SerialReader
+from pybpodapi.com.write_coalescer import WriteCoalescer
+from pybpodapi.com.transports import create_transport, CaptureTransport
 
 logger = logging.getLogger(__name__)
 
@@ -81,21 +85,62 @@ class ArduinoTypes(object):
         return struct.unpack("<Q", message_bytes)[0]
 
 
+_NUMPY_TYPECODES = {
+    ArduinoTypes.UINT8.name: "u1",
+    ArduinoTypes.UINT16.name: "u2",
+    ArduinoTypes.UINT32.name: "u4",
+    ArduinoTypes.FLOAT32.name: "f4",
+}
+
+
 class ArCOM(object):
     """
     ArCOM is an interface to simplify data transactions between Arduino and Python.
     """
 
-    def open(self, serial_port, baudrate=115200, timeout=1):
+    def open(
+        self,
+        serial_port,
+        baudrate=115200,
+        timeout=1,
+        threaded=False,
+        buffer_size=1048576,
+        wakeup=None,
+        transport=None,
+        capture_file=None,
+        coalesce_delay=None,
+    ):
         """
         Open serial connection
-        :param serialPortName:
+        :param serial_port: serial port name, transport url or :class:`pybpodapi.com.transports.Transport` object
         :param baudRate:
+        :param bool threaded: read the port on a background thread into a ring buffer
+        :param int buffer_size: size of the ring buffer in bytes (only used if threaded)
+        :param threading.Event wakeup: event set whenever new bytes arrive (only used if threaded)
+        :param str transport: transport type, deduced from serial_port if None (see :func:`pybpodapi.com.transports.create_transport`)
+        :param str capture_file: record all the bytes read and written into this file (see :class:`pybpodapi.com.transports.CaptureTransport`)
+        :param float coalesce_delay: queue the writes and send them together at most this number of seconds later (None writes immediately)
         :return:
         """
-        self.serial_object = serial.Serial(
-            serial_port, baudrate=baudrate, timeout=timeout
-        )
+        self.serial_object = create_transport(serial_port, baudrate, timeout, transport)
+
+        if capture_file:
+            self.serial_object = CaptureTransport(self.serial_object, capture_file)
+
+        if threaded:
+            self._reader = SerialReader(
+                self.serial_object, buffer_size, timeout, wakeup
+            )
+            self._reader.start()
+            self._input = self._reader.buffer
+        else:
+            self._reader = None
+            self._input = self.serial_object
+
+        self._coalescer = WriteCoalescer(self.serial_object, coalesce_delay)
+        if coalesce_delay is not None:
+            self._coalescer.start()
+        self._batch_depth = 0
 
         return self
 
@@ -104,64 +149,99 @@ class ArCOM(object):
         Close serial connection
         :return:
         """
+        self._coalescer.close()
+        if self._reader is not None:
+            self._reader.close()
         self.serial_object.close()
+        if self._reader is not None:
+            self._reader.join(1)
 
     def bytes_available(self):
         """
 
         :return:
         """
-        return self.serial_object.inWaiting()
+        return self._input.inWaiting()
 
     ##############################################################
     ## WRITE #####################################################
     ##############################################################
 
+    @contextmanager
+    def batch(self):
+        """
+        Queue all the writes done inside the context and send them in a single write at the end.
+
+        Reads flush the queue first, so commands waiting for an answer still work inside the context.
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self._coalescer.flush()
+
+    def flush(self):
+        """
+        Send the queued writes now
+        """
+        self._coalescer.flush()
+
     def write_char(self, value):
-        self.serial_object.write(str.encode(value))
+        self.write_array(str.encode(value))
 
     def write_array(self, array):
-        self.serial_object.write(array)
+        if self._batch_depth or self._coalescer.max_delay is not None:
+            self._coalescer.write(array)
+        else:
+            self.serial_object.write(array)
 
     ##############################################################
     ## READ BYTE #################################################
     ##############################################################
 
+    def __read(self, size):
+        # the queued commands may be the ones the device is about to answer
+        if self._coalescer.pending:
+            self._coalescer.flush()
+        return self._input.read(size)
+
     def read_byte(self):
-        message_bytes = self.serial_object.read(ArduinoTypes.BYTE.size)
+        message_bytes = self.__read(ArduinoTypes.BYTE.size)
         return message_bytes
 
     def read_char(self):
-        message_bytes = self.serial_object.read(ArduinoTypes.CHAR.size)
+        message_bytes = self.__read(ArduinoTypes.CHAR.size)
 
         return message_bytes.decode("utf-8")
 
     def read_uint8(self):
-        message_bytes = self.serial_object.read(ArduinoTypes.UINT8.size)
+        message_bytes = self.__read(ArduinoTypes.UINT8.size)
         # logger.debug("Read %s bytes: %s", len(message_bytes), message_bytes)
         message = int.from_bytes(message_bytes, byteorder="little")
         return message
 
     def read_uint16(self):
-        message_bytes = self.serial_object.read(ArduinoTypes.UINT16.size)
+        message_bytes = self.__read(ArduinoTypes.UINT16.size)
         # logger.debug("Read %s bytes: %s", ArduinoTypes.UINT16.size, message_bytes)
         message = int.from_bytes(message_bytes, byteorder="little")
         return message
 
     def read_uint32(self):
-        message_bytes = self.serial_object.read(ArduinoTypes.UINT32.size)
+        message_bytes = self.__read(ArduinoTypes.UINT32.size)
         # logger.debug("Read %s bytes: %s", ArduinoTypes.UINT32.size, message_bytes)
         message = int.from_bytes(message_bytes, byteorder="little")
         return message
 
     def read_uint64(self):
-        message_bytes = self.serial_object.read(ArduinoTypes.UINT64.size)
+        message_bytes = self.__read(ArduinoTypes.UINT64.size)
         # logger.debug("Read %s bytes: %s", ArduinoTypes.UINT32.size, message_bytes)
         message = int.from_bytes(message_bytes, byteorder="little")
         return message
 
     def read_float32(self):
-        message_bytes = self.serial_object.read(ArduinoTypes.FLOAT32.size)
+        message_bytes = self.__read(ArduinoTypes.FLOAT32.size)
         # logger.debug("Read %s bytes: %s", ArduinoTypes.UINT32.size, message_bytes)
         message = struct.unpack("<f", message_bytes)
         return message[0]
@@ -170,49 +250,40 @@ class ArCOM(object):
     ## READ ARRAY ################################################
     ##############################################################
 
-    def read_bytes_array(self, array_len=1):
-        message_array = []
-        for pos in range(0, array_len):
-            message_bytes = self.read_byte()
-            message_array.append(message_bytes)
-        return message_array
+    def read_bytes_array(self, array_len=1, as_numpy=False):
+        message_bytes = self.__read(array_len)
+        if as_numpy:
+            return np.frombuffer(message_bytes, dtype=str(ArduinoTypes.UINT8))
+        return [message_bytes[i : i + 1] for i in range(len(message_bytes))]
 
     def read_char_array(self, array_len=1):
-        message_array = []
-        for pos in range(0, array_len):
-            message_bytes = self.read_char()
-            message_array.append(message_bytes)
-
-        return message_array
+        message_bytes = self.__read(array_len * ArduinoTypes.CHAR.size)
+        return list(message_bytes.decode("utf-8"))
 
-    def read_uint8_array(self, array_len=1):
-        message_array = []
-        for pos in range(0, array_len):
-            message_bytes = self.read_uint8()
-            message_array.append(message_bytes)
+    def read_uint8_array(self, array_len=1, as_numpy=False):
+        return self.__read_array(array_len, ArduinoTypes.UINT8, as_numpy)
 
-        return message_array
+    def read_uint16_array(self, array_len=1, as_numpy=False):
+        return self.__read_array(array_len, ArduinoTypes.UINT16, as_numpy)
 
-    def read_uint16_array(self, array_len=1):
-        message_array = []
-        for pos in range(0, array_len):
-            message_bytes = self.read_uint16()
-            message_array.append(message_bytes)
+    def read_uint32_array(self, array_len=1, as_numpy=False):
+        return self.__read_array(array_len, ArduinoTypes.UINT32, as_numpy)
 
-        return message_array
+    def read_float32_array(self, array_len=1, as_numpy=False):
+        return self.__read_array(array_len, ArduinoTypes.FLOAT32, as_numpy)
 
-    def read_uint32_array(self, array_len=1):
-        message_array = []
-        for pos in range(0, array_len):
-            message_bytes = self.read_uint32()
-            message_array.append(message_bytes)
-
-        return message_array
-
-    def read_float32_array(self, array_len=1):
-        message_array = []
-        for pos in range(0, array_len):
-            message_bytes = self.read_float32()
-            message_array.append(message_bytes)
+    def __read_array(self, array_len, dtype, as_numpy):
+        """
+        Read a whole array of values with a single read and decode it at once
 
-        return message_array
+        :param int array_len: number of values to read
+        :param DataType dtype: type of each value
+        :param bool as_numpy: return a numpy array instead of a list
+        """
+        message_bytes = self.__read(array_len * dtype.size)
+        # drop any trailing incomplete value in case of a read timeout
+        n_values = len(message_bytes) // dtype.size
+        message_array = np.frombuffer(
+            message_bytes, dtype="<" + _NUMPY_TYPECODES[dtype.name], count=n_values
+        )
+        return message_array if as_numpy else message_array.tolist()
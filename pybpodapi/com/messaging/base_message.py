@@ -1,5 +1,6 @@
 #!/usr/bin/python3
 # -*- coding: utf-8 -*-
+import time
 from datetime import datetime as datetime_now
 from pybpodapi.utils import date_parser
 
@@ -8,16 +9,49 @@ class BaseMessage(object):
     """
     Represents a session message
     It may have been originated from the board of from pc
+
+    The pc timestamp is stored as an integer number of nanoseconds (:func:`time.time_ns`) and converted to a
+    datetime when it is read, to keep the messages small.
     """
 
+    __slots__ = ("_pc_timestamp", "host_timestamp", "content")
+
     MESSAGE_TYPE_ALIAS = "MESSAGE"
     MESSAGE_COLOR = (200, 200, 200)
 
     def __init__(self, content, host_timestamp=None):
-        self.pc_timestamp = datetime_now.now()
+        self._pc_timestamp = time.time_ns()
         self.host_timestamp = host_timestamp
         self.content = content
 
+    @property
+    def pc_timestamp(self):
+        """
+        Local time at which the message was created
+
+        :rtype: datetime
+        """
+        value = self._pc_timestamp
+        if isinstance(value, int):
+            return datetime_now.fromtimestamp(value // 1000000000).replace(microsecond=value // 1000 % 1000000)
+        return value
+
+    @pc_timestamp.setter
+    def pc_timestamp(self, value):
+        self._pc_timestamp = value
+
+    @property
+    def pc_timestamp_ns(self):
+        """
+        Time at which the message was created, in nanoseconds since the epoch
+
+        :rtype: int
+        """
+        value = self._pc_timestamp
+        if value is None or isinstance(value, int):
+            return value
+        return int(value.timestamp()) * 1000000000 + value.microsecond * 1000
+
     def __str__(self):
         return "host-time:{0} pc-time:{1} {2}".format(
             self.host_timestamp if self.host_timestamp is not None else "",
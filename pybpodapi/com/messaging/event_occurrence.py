@@ -14,6 +14,8 @@ class EventOccurrence(BaseMessage):
 
     """
 
+    __slots__ = ("_event_id",)
+
     MESSAGE_TYPE_ALIAS = "EVENT"
 
     def __init__(self, event_id, event_name, host_timestamp=None):
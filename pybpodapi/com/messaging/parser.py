@@ -4,6 +4,15 @@ from pybpodapi.com.messaging.debug import DebugMessage
 from pybpodapi.com.messaging.stderr import StderrMessage
 from pybpodapi.com.messaging.stdout import StdoutMessage
 from pybpodapi.com.messaging.warning import WarningMessage
+from pybpodapi.com.messaging.end_trial import EndTrial
+from pybpodapi.com.messaging.event_occurrence import EventOccurrence
+from pybpodapi.com.messaging.event_resume import EventResume
+from pybpodapi.com.messaging.session_info import SessionInfo
+from pybpodapi.com.messaging.softcode_occurrence import SoftcodeOccurrence
+from pybpodapi.com.messaging.state_occurrence import StateOccurrence
+from pybpodapi.com.messaging.state_transition import StateTransition
+from pybpodapi.com.messaging.trial import Trial
+from pybpodapi.com.messaging.value import ValueMessage
 
 logger = logging.getLogger(__name__)
 
@@ -18,8 +27,35 @@ class MessageParser(object):
         StderrMessage,
         StdoutMessage,
         WarningMessage,
+        Trial,
+        EndTrial,
+        EventOccurrence,
+        EventResume,
+        StateOccurrence,
+        StateTransition,
+        SoftcodeOccurrence,
+        SessionInfo,
+        ValueMessage,
     ]
 
+    # old aliases of the message types, still found in the session files
+    OLD_MESSAGES_TYPES = ["EVENT-RESUME"]
+
+    # parser class -> {message type: message class}, built once per class from its MESSAGES_TYPES_CLASSES
+    _messages_types_cache = {}
+
+    def __init__(self):
+        cls = type(self)
+        messages_types = MessageParser._messages_types_cache.get(cls)
+        if messages_types is None:
+            messages_types = {}
+            for msgtype in [c.MESSAGE_TYPE_ALIAS for c in self.MESSAGES_TYPES_CLASSES] + self.OLD_MESSAGES_TYPES:
+                msgtype_class = self.__find_type(msgtype)
+                if msgtype_class is not None:
+                    messages_types.setdefault(msgtype, msgtype_class)
+            MessageParser._messages_types_cache[cls] = messages_types
+        self._messages_types = messages_types
+
     def fromlist(self, row):
         """
         Parses messages saved on session history file
@@ -38,12 +74,12 @@ class MessageParser(object):
 
         msg = None
         try:
-            msgtype = row[0]
-
-            for msgtype_class in self.MESSAGES_TYPES_CLASSES:
-                if msgtype_class.check_type(msgtype):
-                    msg = msgtype_class.fromlist(row)
-                    break
+            msgtype_class = self._messages_types.get(row[0])
+            if msgtype_class is None:
+                # types accepted by a custom check_type
+                msgtype_class = self.__find_type(row[0])
+            if msgtype_class is not None:
+                msg = msgtype_class.fromlist(row)
         except Exception:
             logger.warning(
                 "Could not parse bpod message: {0}".format(str(row)), exc_info=True
@@ -51,3 +87,12 @@ class MessageParser(object):
             return ErrorMessage(row)  # default case
 
         return msg
+
+    def __find_type(self, msgtype):
+        """
+        :return: the first class of MESSAGES_TYPES_CLASSES representing the message type, or None
+        """
+        for msgtype_class in self.MESSAGES_TYPES_CLASSES:
+            if msgtype_class.check_type(msgtype):
+                return msgtype_class
+        return None
@@ -37,9 +37,13 @@ class SessionInfo(BaseMessage):
         """
         Returns True if the typestr represents the class
         """
-        obj = cls(row[4], float(row[2]) if row[2] else None)
+        obj = cls(
+            row[4],
+            row[5] if len(row) > 5 else None,
+            start_time=float(row[2]) if row[2] else None,
+            end_time=float(row[3]) if row[3] else None,
+        )
         obj.pc_timestamp = date_parser.parse(row[1])
-        obj._infovalue = row[5] if len(row) > 5 else None
         return obj
 
     @property
@@ -49,3 +53,7 @@ class SessionInfo(BaseMessage):
     @property
     def infovalue(self):
         return self._infovalue
+
+    @property
+    def endtime(self):
+        return self._endtime
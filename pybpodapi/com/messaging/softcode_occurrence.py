@@ -13,6 +13,8 @@ class SoftcodeOccurrence(BaseMessage):
 
     """
 
+    __slots__ = ()
+
     MESSAGE_TYPE_ALIAS = "SOFTCODE"
     MESSAGE_COLOR = (40, 30, 30)
 
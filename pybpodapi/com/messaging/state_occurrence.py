@@ -16,6 +16,8 @@ class StateOccurrence(BaseMessage):
     :ivar list(StateDuration) timestamps: a list of timestamps (start and end) that corresponds to occurrences of this state
     """
 
+    __slots__ = ("start_timestamp", "end_timestamp")
+
     MESSAGE_TYPE_ALIAS = "STATE"
     MESSAGE_COLOR = (0, 100, 0)
 
@@ -16,6 +16,8 @@ class StateTransition(BaseMessage):
     :ivar list(StateDuration) timestamps: a list of timestamps (start and end) that corresponds to occurrences of this state
     """
 
+    __slots__ = ()
+
     MESSAGE_TYPE_ALIAS = "TRANSITION"
     MESSAGE_COLOR = (0, 200, 0)
 
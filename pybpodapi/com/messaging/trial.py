@@ -30,6 +30,12 @@ class Trial(BaseMessage):
         self.states_occurrences = []  # type: list(StateOccurrence)
         self.events_occurrences = []  # type: list(EventOccurrence)
 
+        # event name -> positions of its occurrences in events_occurrences, in the order of the first occurrences
+        self._events_positions = {}  # type: dict(str, list(int))
+        self._events_names = {}  # type: dict(int, str)
+        self._indexed_events = None  # list of the indexed events, another list is indexed from the start
+        self._n_indexed_events = 0
+
         self.states = [0]
         self.state_timestamps = [0]
         self.event_timestamps = []  # see also BpodBase.__update_timestamps
@@ -56,14 +62,11 @@ class Trial(BaseMessage):
         :param event_name: name of the event to get timestamps
         :rtype: list(float)
         """
-        event_timestamps = []  # type: list(float)
-
-        for event in self.events_occurrences:
-            name = self.sma.hardware.channels.get_event_name(event.event_id)
-            if name == event_name:
-                event_timestamps.append(event.host_timestamp)
+        self.__index_events()
 
-        return event_timestamps
+        # the timestamps are read now, they are updated at the end of the trial if Bpod does not send them live
+        events = self.events_occurrences
+        return [events[position].host_timestamp for position in self._events_positions.get(event_name, [])]
 
     def get_events_names(self):
         """
@@ -71,14 +74,8 @@ class Trial(BaseMessage):
 
         :rtype: list(str)
         """
-        events_names = []  # type: list(str)
-
-        for event in self.events_occurrences:
-            event_name = self.sma.hardware.channels.get_event_name(event.event_id)
-            if event_name not in events_names:
-                events_names.append(event_name)
-
-        return events_names
+        self.__index_events()
+        return list(self._events_positions)
 
     def get_all_timestamps_by_event(self):
         """
@@ -99,12 +96,42 @@ class Trial(BaseMessage):
 
         :rtype: dict
         """
+        self.__index_events()
+
+        events = self.events_occurrences
         all_timestamps = {}
-        for event_name in self.get_events_names():
-            all_timestamps[event_name] = self.get_timestamps_by_event_name(event_name)
+        for event_name, positions in self._events_positions.items():
+            all_timestamps[event_name] = [events[position].host_timestamp for position in positions]
 
         return all_timestamps
 
+    def __index_events(self):
+        """
+        Index the events added to events_occurrences since the last call. The name of an event id is looked up
+        once, when the id is first seen.
+        """
+        events = self.events_occurrences
+        if events is not self._indexed_events or self._n_indexed_events > len(events):
+            # the list of events was replaced or cleared
+            self._events_positions = {}
+            self._indexed_events = events
+            self._n_indexed_events = 0
+
+        events_names = self._events_names
+        for position in range(self._n_indexed_events, len(events)):
+            event_id = events[position].event_id
+            event_name = events_names.get(event_id)
+            if event_name is None:
+                if self.sma is not None:
+                    event_name = self.sma.hardware.channels.get_event_name(event_id)
+                else:
+                    # e.g. a trial stored without its state machine
+                    event_name = events[position].event_name
+                events_names[event_id] = event_name
+            # several events may have the same name, their occurrences are merged in order
+            self._events_positions.setdefault(event_name, []).append(position)
+        self._n_indexed_events = len(events)
+
     def export(self):
         return {
             "Bpod start timestamp": self.bpod_start_timestamp,
@@ -50,7 +50,7 @@ class ValueMessage(BaseMessage):
         """
         Returns True if the typestr represents the class
         """
-        obj = cls(int(row[4]), row[5], float(row[2]) if row[2] else None)
+        obj = cls(row[4], row[5], float(row[2]) if row[2] else None)
         obj.pc_timestamp = date_parser.parse(row[1])
 
         return obj
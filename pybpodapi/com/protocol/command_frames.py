@@ -0,0 +1,68 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import logging
+import struct
+
+from pybpodapi.com.protocol.send_msg_headers import SendMessageHeader
+
+logger = logging.getLogger(__name__)
+
+
+class CommandFrame(object):
+    """
+    Frame of a command with fixed size arguments.
+
+    The command header and arguments are packed with a :class:`struct.Struct` compiled once, so encoding a
+    command does not build any intermediate object. The frames are shared by all the Bpod objects and threads,
+    :meth:`pack` returns a new bytes object on each call.
+    """
+
+    def __init__(self, header, arguments_format=""):
+        """
+        :param str header: command header (see :class:`pybpodapi.com.protocol.send_msg_headers.SendMessageHeader`)
+        :param str arguments_format: struct format of the arguments (little endian)
+        """
+        self.header = ord(header)
+        self.struct = struct.Struct("<B" + arguments_format)
+
+    def pack(self, *arguments):
+        """
+        Encode the command with the given arguments
+
+        :rtype: bytes
+        """
+        return self.struct.pack(self.header, *arguments)
+
+
+class CommandFrames(object):
+    """
+    Frames of the commands sent at high rate by :class:`pybpodapi.bpod.bpod_com_protocol.BpodCOMProtocol`
+    """
+
+    #: Pause (0) or resume (1) the trial
+    PAUSE_TRIAL = CommandFrame(SendMessageHeader.PAUSE_TRIAL, "B")
+
+    #: Sync channel and sync mode
+    SYNC_CHANNEL_MODE = CommandFrame(SendMessageHeader.SYNC_CHANNEL_MODE, "BB")
+
+    #: Soft code to echo
+    ECHO_SOFTCODE = CommandFrame(SendMessageHeader.ECHO_SOFTCODE, "B")
+
+    #: Event index and event data
+    MANUAL_OVERRIDE_EXEC_EVENT = CommandFrame(SendMessageHeader.MANUAL_OVERRIDE_EXEC_EVENT, "BB")
+
+    #: Soft code
+    TRIGGER_SOFTCODE = CommandFrame(SendMessageHeader.TRIGGER_SOFTCODE, "B")
+
+    #: Channel number and value
+    OVERRIDE_DIGITAL_HW_STATE = CommandFrame(SendMessageHeader.OVERRIDE_DIGITAL_HW_STATE, "BB")
+
+    #: Serial channel and byte
+    SEND_TO_HW_SERIAL = CommandFrame(SendMessageHeader.SEND_TO_HW_SERIAL, "BB")
+
+    #: Module index and relay state
+    SET_MODULE_RELAY = CommandFrame(SendMessageHeader.SET_MODULE_RELAY, "BB")
+
+    #: Module number and message length, followed by the message
+    WRITE_TO_MODULE = CommandFrame(SendMessageHeader.WRITE_TO_MODULE, "BB")
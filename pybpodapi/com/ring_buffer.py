@@ -0,0 +1,132 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import time
+from threading import Event
+
+
+class RingBuffer(object):
+    """
+    Preallocated circular byte buffer shared by one producer and one consumer thread.
+
+    The producer only moves the write counter and the consumer only moves the read counter,
+    so data is passed between threads without any lock. Events are used only to sleep while
+    the buffer is empty (consumer) or full (producer).
+
+    The reading interface mimics the one of a serial port (read, in_waiting, inWaiting),
+    so it can be used by :class:`pybpodapi.com.arcom.ArCOM` in place of the port itself.
+    """
+
+    def __init__(self, size=1048576, timeout=1, wakeup=None):
+        """
+        :param int size: buffer capacity in bytes
+        :param float timeout: read timeout in seconds (None blocks until all bytes are available)
+        :param threading.Event wakeup: optional event set whenever new data is written
+        """
+        self.timeout = timeout
+        self.wakeup = wakeup
+        self.closed = False
+
+        self._size = size
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+
+        self._written = 0  # total of bytes written, only changed by the producer
+        self._read = 0  # total of bytes read, only changed by the consumer
+
+        self._readable = Event()
+        self._writable = Event()
+
+    @property
+    def in_waiting(self):
+        return self._written - self._read
+
+    def inWaiting(self):
+        return self.in_waiting
+
+    def write(self, data):
+        """
+        Copy data into the buffer, waiting for free space if the buffer is full.
+
+        :param bytes data: data to store
+        """
+        data = memoryview(data)
+        n_bytes = len(data)
+        pos = 0
+
+        while pos < n_bytes and not self.closed:
+            free = self._size - (self._written - self._read)
+            if free == 0:
+                self._writable.clear()
+                if self._size - (self._written - self._read) == 0:
+                    self._writable.wait(0.1)
+                continue
+
+            chunk = min(free, n_bytes - pos)
+            start = self._written % self._size
+            first = min(chunk, self._size - start)
+            self._view[start : start + first] = data[pos : pos + first]
+            if chunk > first:
+                self._view[: chunk - first] = data[pos + first : pos + chunk]
+
+            pos += chunk
+            self._written += chunk
+            self._readable.set()
+            if self.wakeup is not None:
+                self.wakeup.set()
+
+    def read(self, size=1):
+        """
+        Read size bytes from the buffer, waiting up to timeout for them to arrive.
+
+        :param int size: number of bytes to read
+        :return: the bytes read, which may be less than size if the timeout expires
+        :rtype: bytes
+        """
+        if self.in_waiting < size:
+            self.wait(size, self.timeout)
+
+        n_bytes = min(size, self.in_waiting)
+        start = self._read % self._size
+        first = min(n_bytes, self._size - start)
+        data = self._view[start : start + first].tobytes()
+        if n_bytes > first:
+            data += self._view[: n_bytes - first].tobytes()
+
+        self._read += n_bytes
+        self._writable.set()
+        return data
+
+    def wait(self, size=1, timeout=None):
+        """
+        Wait until at least size bytes are available to read
+
+        :param int size: number of bytes to wait for
+        :param float timeout: maximum time to wait in seconds (None waits forever)
+        :return: True if the bytes are available, False otherwise
+        :rtype: bool
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while self.in_waiting < size and not self.closed:
+            self._readable.clear()
+            if self.in_waiting >= size:
+                break
+
+            if deadline is None:
+                self._readable.wait()
+            else:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._readable.wait(remaining)
+
+        return self.in_waiting >= size
+
+    def close(self):
+        """
+        Release any thread waiting on the buffer
+        """
+        self.closed = True
+        self._readable.set()
+        self._writable.set()
@@ -0,0 +1,47 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import logging
+from threading import Thread, Event
+
+from pybpodapi.com.ring_buffer import RingBuffer
+
+logger = logging.getLogger(__name__)
+
+
+class SerialReader(Thread):
+    """
+    Thread that drains a serial port into a :class:`pybpodapi.com.ring_buffer.RingBuffer`.
+
+    Bytes are read as soon as they arrive, so the consumer parses them from memory
+    instead of waiting on the USB link.
+    """
+
+    def __init__(self, serial_object, buffer_size=1048576, timeout=1, wakeup=None):
+        """
+        :param serial_object: opened port to read from
+        :param int buffer_size: size of the ring buffer in bytes
+        :param float timeout: read timeout of the ring buffer
+        :param threading.Event wakeup: optional event set whenever new bytes arrive
+        """
+        Thread.__init__(self)
+        self.daemon = True
+        self.serial_object = serial_object
+        self.buffer = RingBuffer(buffer_size, timeout, wakeup)
+        self.event = Event()
+
+    def run(self):
+        try:
+            while not self.event.is_set():
+                # blocks until at least one byte arrives or the port timeout expires
+                data = self.serial_object.read(max(1, self.serial_object.in_waiting))
+                if data:
+                    self.buffer.write(data)
+        except Exception:
+            if not self.event.is_set():
+                logger.error("Serial reader stopped unexpectedly", exc_info=True)
+        finally:
+            self.buffer.close()
+
+    def close(self):
+        self.event.set()
@@ -0,0 +1,152 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import logging
+import queue
+import time
+from threading import Thread
+
+from pybpodapi.com.messaging.event_occurrence import EventOccurrence
+
+logger = logging.getLogger(__name__)
+
+# marks the end of the rows in the queue
+_STOP = object()
+
+
+class SessionWriter(Thread):
+    """
+    Thread writing the rows of the session file, so the disk access does not delay the trial loop.
+
+    Rows queued with :meth:`write`, and messages queued with :meth:`write_message`, are written in batches: the file is flushed after batch_size rows or at most
+    flush_interval seconds after the first row not flushed yet. The queue is bounded, when it is full
+    :meth:`write` waits for the thread. :meth:`close` writes and flushes all the queued rows, including the rows
+    left in the queue if the thread has stopped. An error writing a row is logged and the row is written again
+    once, the thread keeps writing the next rows.
+    """
+
+    def __init__(self, csvwriter, queue_size=10000, batch_size=100, flush_interval=0.5):
+        """
+        :param csvwriter: writer of the session file
+        :param int queue_size: maximum number of rows waiting to be written
+        :param int batch_size: maximum number of rows written between two flushes
+        :param float flush_interval: maximum time (seconds) a written row waits to be flushed
+        """
+        Thread.__init__(self)
+        self.daemon = True
+        self.csvwriter = csvwriter
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue = queue.Queue(queue_size)
+        self._stopped = False  # the rows are written by the caller once the thread has stopped
+
+    def write(self, row):
+        """
+        Queue a row to be written by the thread
+
+        :param list row: row of the session file
+        """
+        if not self.__put(row):
+            # the rows still queued are written first, to keep the order of the rows
+            self.__drain()
+            self.__write_row(row)
+            self.csvwriter.flush()
+
+    def write_message(self, msg):
+        """
+        Queue a session message, its row is built by the thread.
+
+        The timestamps of the events are updated at the end of the trial when Bpod does not send them with the
+        events, so the row of an event keeps the timestamp the event had when it was queued.
+
+        :param BaseMessage msg: session message
+        """
+        self.write((msg, msg.host_timestamp) if isinstance(msg, EventOccurrence) else msg)
+
+    def run(self):
+        pending = 0
+        deadline = None  # time at which the pending rows must be flushed
+        stopping = False
+        try:
+            while not stopping:
+                timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+                try:
+                    row = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    row = None
+
+                try:
+                    if row is _STOP:
+                        stopping = True
+                    elif row is not None:
+                        pending += 1
+                        if deadline is None:
+                            deadline = time.monotonic() + self.flush_interval
+                        self.__write_row(row)
+
+                    if pending and (stopping or pending >= self.batch_size or time.monotonic() >= deadline):
+                        pending = 0
+                        deadline = None
+                        self.csvwriter.flush()
+                except Exception:
+                    logger.error("Session writer could not write the session file", exc_info=True)
+        finally:
+            self._stopped = True
+
+    def close(self):
+        """
+        Write all the queued rows and stop the thread
+        """
+        if self.is_alive() and self.__put(_STOP):
+            self.join()
+        self._stopped = True
+        # rows left in the queue by a thread stopped unexpectedly
+        self.__drain()
+
+    def __put(self, item):
+        """
+        Queue an item, waiting while the queue is full
+
+        :return: False if the thread has stopped
+        :rtype: bool
+        """
+        while not self._stopped:
+            try:
+                self._queue.put(item, timeout=self.flush_interval)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def __drain(self):
+        """
+        Write and flush the rows left in the queue, once the thread has stopped
+        """
+        written = False
+        while True:
+            try:
+                row = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if row is not _STOP:
+                self.__write_row(row)
+                written = True
+        if written:
+            self.csvwriter.flush()
+
+    def __write_row(self, item):
+        if isinstance(item, tuple):
+            msg, host_timestamp = item
+            row = msg.tolist()
+            row[2] = host_timestamp
+        elif isinstance(item, list):
+            row = item
+        else:
+            row = item.tolist()
+
+        try:
+            self.csvwriter.writerow(row)
+        except Exception:
+            logger.error("Could not write a row of the session file, trying again", exc_info=True)
+            self.csvwriter.writerow(row)
@@ -0,0 +1,58 @@
+from sys import platform
+from urllib.parse import parse_qs
+
+from pybpodapi.com.transports.base_transport import Transport
+from pybpodapi.com.transports.serial_transport import SerialTransport
+from pybpodapi.com.transports.tcp_transport import TCPTransport
+from pybpodapi.com.transports.memory_transport import MemoryTransport
+from pybpodapi.com.transports.capture_transport import CaptureTransport, ReplayTransport, read_capture
+
+if platform in ["linux", "linux2", "darwin"]:
+    from pybpodapi.com.transports.pty_transport import PtyTransport
+else:
+    PtyTransport = None
+
+#: Transport names accepted by :func:`create_transport`
+SERIAL = "serial"
+TCP = "tcp"
+PTY = "pty"
+REPLAY = "replay"
+
+
+def create_transport(port, baudrate=115200, timeout=1, transport=None):
+    """
+    Create the transport used to talk with the Bpod device.
+
+    The port may be a :class:`Transport` already created (for example one end of
+    :meth:`MemoryTransport.pair`), an url like ``tcp://host:port`` ``pty:///dev/pts/3`` or ``replay:///path/to/capture``,
+    or a serial port name. A capture is replayed at its original pace with ``replay:///path/to/capture?realtime=1``.
+
+    :param port: transport, url or serial port name
+    :param int baudrate: baudrate for serial connections
+    :param float timeout: read timeout in seconds
+    :param str transport: force the transport type ('serial', 'tcp', 'pty' or 'replay') instead of deducing it from the port
+    :rtype: Transport
+    """
+    if isinstance(port, Transport):
+        return port
+
+    if transport is None:
+        transport = port.split("://", 1)[0] if "://" in port else SERIAL
+
+    address = port.split("://", 1)[1] if "://" in port else port
+
+    if transport == SERIAL:
+        return SerialTransport(address, baudrate, timeout)
+    elif transport == TCP:
+        host, tcp_port = address.rsplit(":", 1)
+        return TCPTransport(host, int(tcp_port), timeout)
+    elif transport == PTY:
+        if PtyTransport is None:
+            raise NotImplementedError("The pty transport is not supported on {0}".format(platform))
+        return PtyTransport(address or None, timeout)
+    elif transport == REPLAY:
+        path, _, query = address.partition("?")
+        realtime = parse_qs(query).get("realtime", ["0"])[-1].lower() in ("1", "true", "yes")
+        return ReplayTransport(path, realtime=realtime, timeout=timeout)
+    else:
+        raise ValueError("Unknown transport: {0}".format(transport))
@@ -0,0 +1,49 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+
+class Transport(object):
+    """
+    Byte stream used by :class:`pybpodapi.com.arcom.ArCOM` to talk with the Bpod device.
+
+    The interface is the subset of the pyserial one used by the API, so a transport can be
+    used wherever a serial port was used before.
+
+    :ivar float timeout: read timeout in seconds (None blocks until all bytes are read)
+    """
+
+    def __init__(self, timeout=1):
+        self.timeout = timeout
+
+    def read(self, size=1):
+        """
+        Read size bytes, waiting up to timeout for them to arrive
+
+        :param int size: number of bytes to read
+        :return: the bytes read, which may be less than size if the timeout expires
+        :rtype: bytes
+        """
+        raise NotImplementedError()
+
+    def write(self, data):
+        """
+        Write data to the stream
+
+        :param bytes data: data to write
+        """
+        raise NotImplementedError()
+
+    @property
+    def in_waiting(self):
+        """
+        Number of bytes that can be read without blocking
+
+        :rtype: int
+        """
+        raise NotImplementedError()
+
+    def inWaiting(self):
+        return self.in_waiting
+
+    def close(self):
+        raise NotImplementedError()
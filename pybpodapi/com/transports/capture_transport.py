@@ -0,0 +1,208 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import struct
+import time
+from bisect import bisect_left
+from threading import Condition, Lock
+
+from pybpodapi.com.transports.base_transport import Transport
+
+#: First bytes of a capture file
+CAPTURE_MAGIC = b"PYBPODCAP1"
+
+#: Direction of the bytes in a capture record
+DEVICE_TO_HOST = 0
+HOST_TO_DEVICE = 1
+
+# direction, host monotonic time in nanoseconds, payload length
+_RECORD_HEADER = struct.Struct("<BQI")
+
+
+def read_capture(path):
+    """
+    Read the records of a capture file
+
+    :param str path: capture file
+    :return: iterator of (direction, monotonic time in nanoseconds, payload)
+    :rtype: iterator(tuple(int, int, bytes))
+    """
+    with open(path, "rb") as infile:
+        if infile.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+            raise ValueError("{0} is not a capture file".format(path))
+
+        while True:
+            header = infile.read(_RECORD_HEADER.size)
+            if len(header) < _RECORD_HEADER.size:
+                break
+            direction, timestamp, length = _RECORD_HEADER.unpack(header)
+            payload = infile.read(length)
+            if len(payload) < length:
+                break  # truncated record, the capture was interrupted
+            yield direction, timestamp, payload
+
+
+class CaptureTransport(Transport):
+    """
+    Transport that records all the traffic of another transport into a capture file.
+
+    Each chunk of bytes read or written is stored as a record with its direction, the host
+    monotonic time (nanoseconds) and the payload. Captures can be read back with
+    :func:`read_capture` or fed to the API with :class:`ReplayTransport`.
+    """
+
+    def __init__(self, transport, path):
+        """
+        :param Transport transport: transport to record
+        :param str path: capture file to create
+        """
+        super(CaptureTransport, self).__init__(transport.timeout)
+        self.transport = transport
+        self.path = path
+
+        # reads and writes may happen in different threads (see pybpodapi.com.serial_reader)
+        self._lock = Lock()
+        self._file = open(path, "wb")
+        self._file.write(CAPTURE_MAGIC)
+
+    def __str__(self):
+        return str(self.transport)
+
+    def read(self, size=1):
+        data = self.transport.read(size)
+        if data:
+            self._record(DEVICE_TO_HOST, data)
+        return data
+
+    def write(self, data):
+        self._record(HOST_TO_DEVICE, data)
+        self.transport.write(data)
+
+    @property
+    def in_waiting(self):
+        return self.transport.in_waiting
+
+    def close(self):
+        self.transport.close()
+        with self._lock:
+            self._file.close()
+
+    def _record(self, direction, data):
+        with self._lock:
+            if not self._file.closed:
+                self._file.write(_RECORD_HEADER.pack(direction, time.monotonic_ns(), len(data)))
+                self._file.write(data)
+
+
+class ReplayTransport(Transport):
+    """
+    Transport that plays back the bytes received from the device in a capture file.
+
+    Each chunk received from the device is made available once the host has written as many
+    bytes as it had written before that chunk in the captured session, so the replay answers
+    the commands like the device did. The content of what the host writes is not checked,
+    so the replay is only meaningful if the host sends the same commands as in the captured session.
+
+    If realtime is True, the chunks answering the same host write keep their original spacing,
+    so the events of a trial arrive at their original pace.
+    """
+
+    def __init__(self, path, realtime=False, timeout=1):
+        """
+        :param str path: capture file
+        :param bool realtime: deliver the bytes at their original pace
+        :param float timeout: read timeout in seconds
+        """
+        super(ReplayTransport, self).__init__(timeout)
+        self.path = path
+        self.realtime = realtime
+
+        chunks = []
+        self._ends = []  # end offset of each chunk in the data
+        self._anchors = []  # bytes written by the host before each chunk
+        self._gaps = []  # seconds since the previous chunk answering the same host write
+        written = 0
+        last_timestamp = None
+        end = 0
+        for direction, timestamp, payload in read_capture(path):
+            if direction == HOST_TO_DEVICE:
+                written += len(payload)
+                last_timestamp = None
+            else:
+                chunks.append(payload)
+                end += len(payload)
+                self._ends.append(end)
+                self._anchors.append(written)
+                self._gaps.append(0 if last_timestamp is None else (timestamp - last_timestamp) / 1e9)
+                last_timestamp = timestamp
+
+        self._data = b"".join(chunks)
+        self._pos = 0
+        self._due = 0  # number of chunks available to read
+        self._last_due_time = 0
+
+        self._condition = Condition()
+        self._written = 0
+        self._written_ends = [0]  # bytes written by the host after each write
+        self._written_times = [time.monotonic()]
+
+    def __str__(self):
+        return "replay://{0}{1}".format(self.path, "?realtime=1" if self.realtime else "")
+
+    def read(self, size=1):
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+
+        with self._condition:
+            while self.in_waiting < size and self._due < len(self._ends):
+                wait = self._next_due_time()
+                if wait is not None:
+                    wait -= time.monotonic()
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    wait = remaining if wait is None else min(wait, remaining)
+                if wait is None or wait > 0:
+                    self._condition.wait(wait)
+
+            data = self._data[self._pos : min(self._pos + size, self._available())]
+            self._pos += len(data)
+            return data
+
+    def write(self, data):
+        with self._condition:
+            self._written += len(data)
+            self._written_ends.append(self._written)
+            self._written_times.append(time.monotonic())
+            self._condition.notify_all()
+
+    @property
+    def in_waiting(self):
+        return self._available() - self._pos
+
+    def close(self):
+        pass
+
+    def _next_due_time(self):
+        """
+        Time at which the next chunk is due, or None if the host has not written enough bytes yet
+        """
+        anchor = self._anchors[self._due]
+        if anchor > self._written:
+            return None
+        if not self.realtime:
+            return 0
+        write_time = self._written_times[bisect_left(self._written_ends, anchor)]
+        return max(write_time, self._last_due_time + self._gaps[self._due])
+
+    def _available(self):
+        """
+        Number of bytes available to read
+        """
+        while self._due < len(self._ends):
+            due_time = self._next_due_time()
+            if due_time is None or due_time > time.monotonic():
+                break
+            self._due += 1
+            self._last_due_time = due_time
+        return self._ends[self._due - 1] if self._due else 0
@@ -0,0 +1,86 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import time
+from threading import Condition
+
+from pybpodapi.com.transports.base_transport import Transport
+
+
+class MemoryPipe(object):
+    """
+    One way in-memory byte stream
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.condition = Condition()
+        self.closed = False
+
+    def write(self, data):
+        with self.condition:
+            self.buffer += data
+            self.condition.notify_all()
+
+    def read(self, size, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self.condition:
+            while len(self.buffer) < size and not self.closed:
+                if deadline is None:
+                    self.condition.wait()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+
+            data = bytes(self.buffer[:size])
+            del self.buffer[:size]
+            return data
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class MemoryTransport(Transport):
+    """
+    Transport over an in-memory pipe, to run the API against an emulated device without any hardware.
+
+    Use :meth:`MemoryTransport.pair` to create the two connected ends.
+    """
+
+    def __init__(self, incoming, outgoing, timeout=1):
+        super(MemoryTransport, self).__init__(timeout)
+        self._incoming = incoming  # type: MemoryPipe
+        self._outgoing = outgoing  # type: MemoryPipe
+
+    @staticmethod
+    def pair(timeout=1):
+        """
+        Create two transports connected to each other
+
+        :param float timeout: read timeout of both ends
+        :rtype: tuple(MemoryTransport, MemoryTransport)
+        """
+        a2b, b2a = MemoryPipe(), MemoryPipe()
+        return MemoryTransport(b2a, a2b, timeout), MemoryTransport(a2b, b2a, timeout)
+
+    def __str__(self):
+        return "memory://{0}".format(id(self))
+
+    def read(self, size=1):
+        return self._incoming.read(size, self.timeout)
+
+    def write(self, data):
+        self._outgoing.write(data)
+
+    @property
+    def in_waiting(self):
+        return len(self._incoming.buffer)
+
+    def close(self):
+        self._incoming.close()
+        self._outgoing.close()
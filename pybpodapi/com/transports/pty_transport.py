@@ -0,0 +1,74 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import fcntl
+import os
+import pty
+import select
+import struct
+import termios
+import time
+import tty
+
+from pybpodapi.com.transports.base_transport import Transport
+
+
+class PtyTransport(Transport):
+    """
+    Transport over a POSIX pseudo-terminal.
+
+    If no path is given a new pseudo-terminal pair is created: this transport holds the master
+    side and any program can open :attr:`slave_name` as if it were a serial port.
+
+    :ivar str slave_name: path of the slave side of the created pseudo-terminal
+    """
+
+    def __init__(self, path=None, timeout=1):
+        super(PtyTransport, self).__init__(timeout)
+
+        if path is None:
+            self.fd, self._slave_fd = pty.openpty()
+            # raw mode on the slave avoids echo and line buffering before a client configures it
+            tty.setraw(self._slave_fd)
+            self.slave_name = os.ttyname(self._slave_fd)
+        else:
+            self.fd = os.open(path, os.O_RDWR | os.O_NOCTTY)
+            tty.setraw(self.fd)
+            self._slave_fd = None
+            self.slave_name = path
+
+    def __str__(self):
+        return self.slave_name
+
+    def read(self, size=1):
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        data = b""
+
+        while len(data) < size:
+            timeout = None if deadline is None else max(0, deadline - time.monotonic())
+            if not select.select([self.fd], [], [], timeout)[0]:
+                break
+            try:
+                chunk = os.read(self.fd, size - len(data))
+            except OSError:  # the other side of the pseudo-terminal was closed
+                break
+            if not chunk:
+                break
+            data += chunk
+
+        return data
+
+    def write(self, data):
+        data = memoryview(data)
+        while len(data):
+            data = data[os.write(self.fd, data) :]
+
+    @property
+    def in_waiting(self):
+        buf = fcntl.ioctl(self.fd, termios.FIONREAD, b"\0\0\0\0")
+        return struct.unpack("I", buf)[0]
+
+    def close(self):
+        os.close(self.fd)
+        if self._slave_fd is not None:
+            os.close(self._slave_fd)
@@ -0,0 +1,33 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import serial
+
+from pybpodapi.com.transports.base_transport import Transport
+
+
+class SerialTransport(Transport):
+    """
+    Transport over a serial port (pyserial)
+    """
+
+    def __init__(self, serial_port, baudrate=115200, timeout=1):
+        super(SerialTransport, self).__init__(timeout)
+        self.serial_port = serial_port
+        self.serial_object = serial.Serial(serial_port, baudrate=baudrate, timeout=timeout)
+
+    def __str__(self):
+        return str(self.serial_port)
+
+    def read(self, size=1):
+        return self.serial_object.read(size)
+
+    def write(self, data):
+        self.serial_object.write(data)
+
+    @property
+    def in_waiting(self):
+        return self.serial_object.in_waiting
+
+    def close(self):
+        self.serial_object.close()
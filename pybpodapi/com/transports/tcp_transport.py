@@ -0,0 +1,90 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import select
+import socket
+import time
+
+import serial
+
+from pybpodapi.com.transports.base_transport import Transport
+
+
+class TCPTransport(Transport):
+    """
+    Transport over a TCP connection, for example to a serial-to-Ethernet bridge
+
+    When the connection is closed by the peer, the bytes already received can still be read, then
+    :meth:`read` and :attr:`in_waiting` raise a :class:`serial.SerialException` like a disconnected serial port.
+    """
+
+    def __init__(self, host, port, timeout=1):
+        super(TCPTransport, self).__init__(timeout)
+        self.host = host
+        self.port = port
+
+        self._socket = socket.create_connection((host, port))
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._socket.setblocking(False)
+        self._buffer = bytearray()
+        self._peer_closed = False
+
+    def __str__(self):
+        return "tcp://{0}:{1}".format(self.host, self.port)
+
+    def read(self, size=1):
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+
+        while len(self._buffer) < size and not self._peer_closed:
+            timeout = None if deadline is None else max(0, deadline - time.monotonic())
+            if not select.select([self._socket], [], [], timeout)[0]:
+                break
+            try:
+                data = self._socket.recv(65536)
+            except BlockingIOError:
+                continue
+            if not data:
+                self._peer_closed = True
+                break
+            self._buffer += data
+
+        self.__check_connection()
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def write(self, data):
+        # the socket stays non-blocking, other threads may be reading it (see pybpodapi.com.serial_reader)
+        view = memoryview(data)
+        while view:
+            select.select([], [self._socket], [])
+            try:
+                sent = self._socket.send(view)
+            except BlockingIOError:
+                continue
+            view = view[sent:]
+
+    @property
+    def in_waiting(self):
+        while not self._peer_closed and select.select([self._socket], [], [], 0)[0]:
+            try:
+                data = self._socket.recv(65536)
+            except BlockingIOError:
+                break
+            if not data:
+                self._peer_closed = True
+                break
+            self._buffer += data
+
+        self.__check_connection()
+        return len(self._buffer)
+
+    def close(self):
+        self._socket.close()
+
+    def __check_connection(self):
+        """
+        Raise an error once the peer has closed the connection and all the bytes received were read
+        """
+        if self._peer_closed and not self._buffer:
+            raise serial.SerialException("{0}: the connection was closed by the peer".format(self))
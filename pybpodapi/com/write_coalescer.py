@@ -0,0 +1,77 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import logging
+import time
+from threading import Thread, Event, Lock
+
+logger = logging.getLogger(__name__)
+
+
+class WriteCoalescer(Thread):
+    """
+    Queue of commands concatenated into a single write to the port.
+
+    Commands queued with :meth:`write` are sent together by :meth:`flush`. If a maximum delay
+    is given, the thread flushes the queue at most max_delay seconds after the first queued
+    command, so bursts of commands become one USB transfer with a bounded latency.
+    """
+
+    def __init__(self, serial_object, max_delay=None):
+        """
+        :param serial_object: opened port to write to
+        :param float max_delay: maximum time (seconds) a command waits in the queue, None disables the thread
+        """
+        Thread.__init__(self)
+        self.daemon = True
+        self.serial_object = serial_object
+        self.max_delay = max_delay
+
+        self.pending = bytearray()
+        self._first_write = None  # time at which the oldest pending command was queued
+        self._lock = Lock()
+        self._queued = Event()
+        self.event = Event()
+
+    def write(self, data):
+        """
+        Queue data to be written on the next flush
+
+        :param bytes data: data to queue
+        """
+        with self._lock:
+            if not self.pending:
+                self._first_write = time.monotonic()
+            self.pending += data
+        self._queued.set()
+
+    def flush(self):
+        """
+        Write all the queued data at once
+        """
+        with self._lock:
+            if self.pending:
+                # the write is done under the lock to keep the commands order between threads
+                self.serial_object.write(bytes(self.pending))
+                self.pending.clear()
+
+    def run(self):
+        try:
+            while not self.event.is_set():
+                self._queued.wait()
+                self._queued.clear()
+
+                first_write = self._first_write
+                if self.pending and first_write is not None:
+                    remaining = first_write + self.max_delay - time.monotonic()
+                    if remaining > 0:
+                        self.event.wait(remaining)
+                    self.flush()
+        except Exception:
+            if not self.event.is_set():
+                logger.error("Write coalescer stopped unexpectedly", exc_info=True)
+
+    def close(self):
+        self.event.set()
+        self._queued.set()
+        self.flush()
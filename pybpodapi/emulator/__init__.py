@@ -0,0 +1 @@
+from pybpodapi.emulator.bpod_emulator import BpodEmulator
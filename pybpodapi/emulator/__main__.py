@@ -0,0 +1,43 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Run a Bpod emulator on a new pseudo-terminal::
+
+    python -m pybpodapi.emulator --event-rate 1000
+
+The path of the pseudo-terminal is printed and can be used as the Bpod serial port.
+"""
+
+import argparse
+import time
+
+from pybpodapi.com.transports import PtyTransport
+from pybpodapi.emulator import BpodEmulator
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bpod state machine emulator")
+    parser.add_argument("--event-rate", type=float, default=0, help="input events generated per second during a trial")
+    parser.add_argument("--no-live-timestamps", action="store_true", help="send the events timestamps at the end of each trial")
+    parser.add_argument("--realtime", action="store_true", help="run the trials in real time instead of as fast as possible")
+    args = parser.parse_args()
+
+    emulator = BpodEmulator(
+        PtyTransport(),
+        event_rate=args.event_rate,
+        live_timestamps=not args.no_live_timestamps,
+        realtime=args.realtime,
+    ).start()
+
+    print(emulator.port, flush=True)
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        emulator.stop()
+
+
+if __name__ == "__main__":
+    main()
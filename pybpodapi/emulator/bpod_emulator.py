@@ -0,0 +1,458 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import logging
+import struct
+import time
+from threading import Thread, Event
+
+import numpy as np
+
+from pybpodapi.com.protocol.send_msg_headers import SendMessageHeader
+from pybpodapi.com.protocol.recv_msg_headers import ReceiveMessageHeader
+
+logger = logging.getLogger(__name__)
+
+
+class EmulatedStateMachine(object):
+    """
+    State machine decoded from the message sent by :meth:`pybpodapi.bpod.bpod_base.BpodBase.send_state_machine`.
+
+    Only the data needed to walk through the states is kept: state timers, state timer transitions,
+    input transitions and output actions.
+    """
+
+    def __init__(self, body, n_global_timers_hw, use_255_back_signal=False):
+        """
+        :param bytes body: state machine message without the 5 bytes header
+        :param int n_global_timers_hw: number of global timers of the emulated hardware
+        :param bool use_255_back_signal: whether the state 255 means "go back to the previous state"
+        """
+        self.use_255_back_signal = use_255_back_signal
+
+        n_states, n_timers, n_counters, n_conditions = body[:4]
+        self.n_states = n_states
+        pos = 4
+
+        self.state_timer_matrix = list(body[pos : pos + n_states])
+        pos += n_states
+
+        matrices = []
+        # input, output, global timer start, global timer end, global counter and condition matrices
+        for _ in range(6):
+            matrix = []
+            for _ in range(n_states):
+                n_pairs = body[pos]
+                pos += 1
+                matrix.append(
+                    {body[pos + 2 * i]: body[pos + 2 * i + 1] for i in range(n_pairs)}
+                )
+                pos += 2 * n_pairs
+            matrices.append(matrix)
+
+        self.input_matrix = matrices[0]
+        self.output_matrix = matrices[1]
+
+        # global timers channels, on/off messages, loop modes and events, global counters events,
+        # conditions channels and values and global counters resets
+        pos += 5 * n_timers + n_counters + 2 * n_conditions + n_states
+
+        if n_global_timers_hw > 16:
+            width = 4
+        elif n_global_timers_hw > 8:
+            width = 2
+        else:
+            width = 1
+        pos += width * (2 * n_states + n_timers)
+
+        self.state_timers = np.frombuffer(body, dtype="<u4", count=n_states, offset=pos)
+
+
+class BpodEmulator(object):
+    """
+    Emulates a Bpod state machine (firmware 22) well enough to run the API without hardware.
+
+    The emulator implements the handshake, the hardware description, ports, sync and modules
+    configuration, the installation of state machines and their execution. While a trial runs
+    it walks through the states using the state timers and an input event stream with a
+    configurable rate. Global timers, global counters and conditions are not emulated.
+
+    Example:
+
+    .. code-block:: python
+
+        from pybpodapi.com.transports import PtyTransport
+        from pybpodapi.emulator import BpodEmulator
+
+        emulator = BpodEmulator(PtyTransport(), event_rate=1000).start()
+        my_bpod = Bpod(serial_port=emulator.port)
+
+    :ivar str port: port the API should open to talk with this emulator (pseudo-terminal transports only)
+    """
+
+    FIRMWARE_VERSION = 22
+    MACHINE_TYPE = 3
+
+    def __init__(
+        self,
+        transport,
+        event_rate=0,
+        event_ports=(1,),
+        live_timestamps=True,
+        realtime=False,
+        max_states=256,
+        cycle_period=100,
+        max_serial_events=75,
+        n_global_timers=16,
+        n_global_counters=8,
+        n_conditions=16,
+        inputs="UUUXBBWWPPPPPPPP",
+        outputs="UUUXBBWWPPPPPPPPVVVVVVVV",
+    ):
+        """
+        :param Transport transport: transport used to talk with the API
+        :param float event_rate: rate of the input events generated while a trial runs (events per second)
+        :param tuple(int) event_ports: behavior ports whose In and Out events are generated, in turn
+        :param bool live_timestamps: send the timestamp of each event with it, or all at the end of the trial
+        :param bool realtime: run the trials in real time, or as fast as possible
+        """
+        self.transport = transport
+        self.event_rate = event_rate
+        self.event_ports = event_ports
+        self.live_timestamps = live_timestamps
+        self.realtime = realtime
+
+        self.max_states = max_states
+        self.cycle_period = cycle_period  # microseconds
+        self.max_serial_events = max_serial_events
+        self.n_global_timers = n_global_timers
+        self.n_global_counters = n_global_counters
+        self.n_conditions = n_conditions
+        self.inputs = inputs
+        self.outputs = outputs
+
+        n_modules = inputs.count("U")
+        self.modules_events = [int(max_serial_events / (n_modules + 1))] * n_modules
+        self._update_events_positions()
+
+        self.sma = None  # type: EmulatedStateMachine
+        self._next_sma = None  # state machine waiting to run as soon as possible
+        self._ack_pending = False
+        self._running = False
+        self._stop = Event()
+        self._thread = None
+        self._clock_start = time.monotonic()
+        self._clock_micros = 0  # session clock when running as fast as possible
+
+        self.n_trials = 0
+        self.n_events = 0
+
+    @property
+    def port(self):
+        return getattr(self.transport, "slave_name", None)
+
+    def start(self):
+        """
+        Run the emulator on a background thread
+        """
+        self._thread = Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(2)
+
+    def run(self):
+        """
+        Serve the commands received until the emulator is stopped
+        """
+        while not self._stop.is_set():
+            command = self.transport.read(1)
+            if command:
+                self._handle_command(command.decode("latin-1"))
+
+    #########################################
+    ############ COMMANDS ###################
+    #########################################
+
+    def _handle_command(self, command):
+        if command == SendMessageHeader.HANDSHAKE:
+            self._write(ReceiveMessageHeader.HANDSHAKE_OK.encode())
+
+        elif command == SendMessageHeader.FIRMWARE_VERSION:
+            self._write(struct.pack("<HH", self.FIRMWARE_VERSION, self.MACHINE_TYPE))
+
+        elif command == SendMessageHeader.HARDWARE_DESCRIPTION:
+            self._write(
+                struct.pack(
+                    "<HHBBBBB",
+                    self.max_states,
+                    self.cycle_period,
+                    self.max_serial_events,
+                    self.n_global_timers,
+                    self.n_global_counters,
+                    self.n_conditions,
+                    len(self.inputs),
+                )
+                + self.inputs.encode()
+                + bytes([len(self.outputs)])
+                + self.outputs.encode()
+            )
+
+        elif command == SendMessageHeader.GET_TIMESTAMP_TRANSMISSION:
+            self._write(bytes([1 if self.live_timestamps else 0]))
+
+        elif command == SendMessageHeader.ENABLE_PORTS:
+            self._read(len(self.inputs))
+            self._write(bytes([ReceiveMessageHeader.ENABLE_PORTS_OK]))
+
+        elif command == SendMessageHeader.SYNC_CHANNEL_MODE:
+            self._read(2)
+            self._write(bytes([ReceiveMessageHeader.SYNC_CHANNEL_MODE_OK]))
+
+        elif command == SendMessageHeader.GET_MODULES:
+            # no module connected
+            self._write(bytes(len(self.modules_events)))
+
+        elif command == "%":  # modules events assignment
+            self.modules_events = list(self._read(len(self.modules_events) + 1)[:-1])
+            self._update_events_positions()
+            self._write(bytes([1]))
+
+        elif command == SendMessageHeader.NEW_STATE_MATRIX:
+            run_asap, use_255_back_signal, body_size = struct.unpack("<BBH", self._read(4))
+            sma = EmulatedStateMachine(
+                self._read(body_size), self.n_global_timers, use_255_back_signal == 1
+            )
+            if self._running and run_asap:
+                self._next_sma = sma
+            else:
+                self.sma = sma
+                self._ack_pending = True
+                if run_asap:
+                    self._run_trials()
+
+        elif command == SendMessageHeader.RUN_STATE_MACHINE:
+            if not self._running:
+                self._run_trials()
+
+        elif command == SendMessageHeader.EXIT_AND_RETURN:
+            self._running = False
+
+        elif command == SendMessageHeader.TRIGGER_SOFTCODE:
+            # soft code 0 is received as the event SoftCode1
+            self._inject_event(self.events_positions["USB"] + self._read(1)[0])
+
+        elif command == SendMessageHeader.MANUAL_OVERRIDE_EXEC_EVENT:
+            event_index, _ = self._read(2)
+            self._inject_event(event_index)
+
+        elif command == SendMessageHeader.LOAD_SERIAL_MESSAGE:
+            _, n_messages = self._read(2)
+            for _ in range(n_messages):
+                _, message_length = self._read(2)
+                self._read(message_length)
+            self._write(bytes([ReceiveMessageHeader.LOAD_SERIAL_MESSAGE_OK]))
+
+        elif command == SendMessageHeader.RESET_SERIAL_MESSAGES:
+            self._write(bytes([ReceiveMessageHeader.RESET_SERIAL_MESSAGES]))
+
+        elif command == SendMessageHeader.RESET_CLOCK:
+            self._clock_start = time.monotonic()
+            self._clock_micros = 0
+            self._write(bytes(1))
+
+        elif command in (
+            SendMessageHeader.OVERRIDE_DIGITAL_HW_STATE,
+            SendMessageHeader.SEND_TO_HW_SERIAL,
+            SendMessageHeader.SET_MODULE_RELAY,
+        ):
+            self._read(2)
+
+        elif command in (SendMessageHeader.PAUSE_TRIAL, SendMessageHeader.ECHO_SOFTCODE):
+            self._read(1)
+
+        elif command == SendMessageHeader.WRITE_TO_MODULE:
+            _, n_bytes = self._read(2)
+            self._read(n_bytes)
+
+        elif command == SendMessageHeader.DISCONNECT:
+            self._write(b"1")
+
+        else:
+            logger.warning("Emulator received an unknown command: %s", command)
+
+    #########################################
+    ############ TRIALS #####################
+    #########################################
+
+    def _run_trials(self):
+        """
+        Run the installed state machine, and the following ones sent to run as soon as possible
+        """
+        while True:
+            self._run_trial()
+            if self._next_sma is None:
+                break
+            self.sma, self._next_sma = self._next_sma, None
+            self._ack_pending = True
+
+    def _run_trial(self):
+        sma = self.sma
+        cycles_per_second = 1000000.0 / self.cycle_period
+        tup = self.events_positions["Tup"]
+
+        if self._ack_pending:
+            self._write(bytes([ReceiveMessageHeader.STATE_MACHINE_INSTALLATION_STATUS]))
+            self._ack_pending = False
+
+        trial_start_micros = self._session_micros()
+        self._write(struct.pack("<Q", trial_start_micros))
+
+        self._running = True
+        self._injected = []
+        self._trial_wall_start = time.monotonic()
+        self._trial_timestamps = []
+        self.n_trials += 1
+
+        input_events = [
+            self.events_positions["Port"] + 2 * (port - 1) + direction
+            for port in self.event_ports
+            for direction in (0, 1)
+        ]
+        input_period = cycles_per_second / self.event_rate if self.event_rate else None
+        next_input = input_period if input_period else float("inf")
+        input_index = 0
+
+        previous_state = state = 0
+        state_start = 0
+        now = 0
+        self._enter_state(sma, state, now)
+
+        while self._running:
+            if sma.state_timer_matrix[state] != state:
+                tup_time = state_start + int(sma.state_timers[state])
+            else:
+                tup_time = float("inf")
+
+            if next_input <= tup_time:
+                event_time, event_id = next_input, input_events[input_index]
+            else:
+                event_time, event_id = tup_time, tup
+
+            # handle commands arriving from the host before the next event
+            while self._running and not self._injected:
+                if self.transport.in_waiting:
+                    self._handle_command(self.transport.read(1).decode("latin-1"))
+                elif event_time == float("inf"):
+                    time.sleep(0.001)
+                elif not self.realtime or self._trial_cycles() >= event_time:
+                    break
+                else:
+                    time.sleep(min(0.001, (event_time - self._trial_cycles()) / cycles_per_second))
+
+            if not self._running:
+                # trial stopped by the host
+                now = self._trial_cycles() if self.realtime else now
+                self._send_events([255], now)
+                break
+
+            if self._injected:
+                event_id = self._injected.pop(0)
+                now = self._trial_cycles() if self.realtime else now
+                destination = sma.input_matrix[state].get(event_id)
+            else:
+                now = int(event_time)
+                if event_id == tup:
+                    destination = sma.state_timer_matrix[state]
+                else:
+                    destination = sma.input_matrix[state].get(event_id)
+                    next_input += input_period
+                    input_index = (input_index + 1) % len(input_events)
+
+            if destination == 255 and sma.use_255_back_signal:
+                destination = previous_state
+
+            if destination is not None and destination >= sma.n_states:
+                self._send_events([event_id, 255], now)
+                break
+
+            self._send_events([event_id], now)
+
+            if destination is not None:
+                previous_state, state, state_start = state, destination, now
+                self._enter_state(sma, state, now)
+
+        self._running = False
+        trial_end_micros = trial_start_micros + int(now * self.cycle_period)
+        self._clock_micros = max(self._clock_micros, trial_end_micros)
+        self._write(struct.pack("<IQ", now, trial_end_micros))
+
+        if not self.live_timestamps:
+            self._write(
+                struct.pack("<H", len(self._trial_timestamps))
+                + np.array(self._trial_timestamps, dtype="<u4").tobytes()
+            )
+
+    def _enter_state(self, sma, state, now):
+        softcode = sma.output_matrix[state].get(self.outputs.index("X"))
+        if softcode is not None:
+            self._write(bytes([2, softcode]))
+
+    def _send_events(self, events, now):
+        self.n_events += 1
+        message = bytes([1, len(events)] + events)
+        if self.live_timestamps:
+            message += struct.pack("<I", now)
+        else:
+            self._trial_timestamps.append(now)
+        self._write(message)
+
+    def _inject_event(self, event_id):
+        if self._running:
+            self._injected.append(event_id)
+
+    #########################################
+    ############ AUXILIARY ##################
+    #########################################
+
+    def _update_events_positions(self):
+        """
+        Compute the events indexes following the same order used by :class:`pybpodapi.bpod.hardware.channels.Channels`
+        """
+        n_modules = len(self.modules_events)
+        positions = {}
+        pos = 0
+        n_uart = 0
+        for channel in self.inputs:
+            if channel == "U":
+                pos += self.modules_events[n_uart]
+                n_uart += 1
+            elif channel == "X":
+                positions.setdefault("USB", pos)
+                pos += int(self.max_serial_events / (n_modules + 1))
+            elif channel in "PBW":
+                positions.setdefault({"P": "Port", "B": "BNC", "W": "Wire"}[channel], pos)
+                pos += 2
+        pos += 2 * self.n_global_timers + self.n_global_counters + self.n_conditions
+        positions["Tup"] = pos
+        self.events_positions = positions
+
+    def _trial_cycles(self):
+        return int((time.monotonic() - self._trial_wall_start) * 1000000.0 / self.cycle_period)
+
+    def _session_micros(self):
+        if self.realtime:
+            return int((time.monotonic() - self._clock_start) * 1000000.0)
+        return self._clock_micros
+
+    def _read(self, size):
+        data = b""
+        while len(data) < size and not self._stop.is_set():
+            data += self.transport.read(size - len(data))
+        return data
+
+    def _write(self, data):
+        self.transport.write(data)
@@ -1,3 +1,4 @@
 from pybpodapi.bpod import Bpod
 from pybpodapi.state_machine import StateMachine
 from pybpodapi.bpod.hardware.output_channels import OutputChannel
+from pybpodapi.state_machine.state_machine_template import StateMachineTemplate
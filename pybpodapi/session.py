@@ -1,7 +1,9 @@
 # !/usr/bin/python3
 # -*- coding: utf-8 -*-
 
+import atexit
 import logging
+import os
 from confapp import conf
 from datetime import datetime as datetime_now
 
@@ -14,6 +16,9 @@ from sca.formats import csv
 import sys
 from pybpodapi.com.stdout_buffer import StdoutBuffer
 from pybpodapi.com.stderr_buffer import StderrBuffer
+from pybpodapi.com.session_writer import SessionWriter
+from pybpodapi.session_store import TrialStore
+from pybpodapi.session_binary import SessionBinaryWriter
 
 logger = logging.getLogger(__name__)
 
@@ -40,7 +45,8 @@ class Session(object):
     """
     Stores information about bpod run, including the list of trials.
 
-    :ivar list(Trial) trials: a list of trials
+    :ivar list(Trial) trials: a list of trials, a :class:`pybpodapi.session_store.TrialStore` if only the last
+        trials are kept in memory (see the setting PYBPOD_API_SESSION_KEEP_TRIALS)
     :ivar int firmware_version: firmware version of Bpod when experiment was run
     :ivar int bpod_version: version of Bpod hardware when experiment was run
     :ivar datetime start_timestamp: it stores session start timestamp
@@ -86,18 +92,28 @@ class Session(object):
         streams = []
 
         self.history = []  # type: list[Trial]
-        self.trials = []  # type: list[Trial]
+        if conf.PYBPOD_API_SESSION_KEEP_TRIALS is None:
+            self.trials = []  # type: list[Trial]
+        else:
+            self.trials = TrialStore(conf.PYBPOD_API_SESSION_KEEP_TRIALS)
+        self._trials_positions = []  # position in the history of the trials in memory
         self.firmware_version = None  # type: int
         self.bpod_version = None  # type: int
         self.start_timestamp = datetime_now.now()  # type: datetime
 
         self.csvwriter = None
+        self.writer = None  # type: SessionWriter
+        self.binary_writer = None  # type: SessionBinaryWriter
         self._path = path
+        self._closed = False
 
         # stream data to a file.
         if path:
             streams += [open(path, "w")]
 
+            if conf.PYBPOD_API_SESSION_BINARY_FILE:
+                self.binary_writer = SessionBinaryWriter(os.path.splitext(path)[0] + ".bin")
+
         # stream data to the stdout.
         if conf.PYBPOD_API_STREAM2STDOUT:
             sys.stdout = StdoutBuffer(self)
@@ -120,7 +136,37 @@ class Session(object):
             def_text="This file contains data recorded during a session from the PyBpod system",
         )
 
+        if conf.PYBPOD_API_SESSION_WRITER_THREAD:
+            self.writer = SessionWriter(
+                self.csvwriter,
+                queue_size=conf.PYBPOD_API_SESSION_WRITER_QUEUE_SIZE,
+                batch_size=conf.PYBPOD_API_SESSION_WRITER_BATCH_SIZE,
+                flush_interval=conf.PYBPOD_API_SESSION_WRITER_FLUSH_INTERVAL,
+            )
+            self.writer.start()
+            # write the queued messages even if the program ends without closing the session
+            atexit.register(self.writer.close)
+
     def __del__(self):
+        self.close()
+
+    def close(self):
+        """
+        Write the pending messages, close the session file and restore the stdout and stderr
+        """
+        if self._closed:
+            return
+        self._closed = True
+
+        if self.writer is not None:
+            self.writer.close()
+            atexit.unregister(self.writer.close)
+
+        if isinstance(self.trials, TrialStore):
+            self.trials.close()
+
+        if self.binary_writer is not None:
+            self.binary_writer.close()
 
         self.csvstream.close()
 
@@ -136,77 +182,107 @@ class Session(object):
 
         if isinstance(msg, Trial):
             self.trials.append(msg)
+            if isinstance(self.trials, TrialStore):
+                self.__remove_stored_trials_messages()
         elif self.current_trial is not None:
             self.current_trial += msg
 
         self.history.append(msg)
 
-        if self.csvwriter:
+        if self.binary_writer is not None:
+            self.binary_writer.add(msg)
+
+        if self.writer is not None:
+            # the row is built by the writer thread
+            self.writer.write_message(msg)
+        elif self.csvwriter:
             self.csvwriter.writerow(msg.tolist())
             self.csvwriter.flush()
 
         return self
 
+    def add_messages(self, msgs):
+        """
+        Add several messages of the current trial, their rows are written together in the session file
+
+        :param list(BaseMessage) msgs: messages, which are not trials
+        """
+        current_trial = self.current_trial
+        if current_trial is not None:
+            for msg in msgs:
+                current_trial += msg
+
+        self.history.extend(msgs)
+
+        if self.binary_writer is not None:
+            for msg in msgs:
+                self.binary_writer.add(msg)
+
+        if self.writer is not None:
+            for msg in msgs:
+                self.writer.write_message(msg)
+        elif self.csvwriter:
+            for msg in msgs:
+                self.csvwriter.writerow(msg.tolist())
+            self.csvwriter.flush()
+
     def add_trial_events(self):
 
         current_trial = self.current_trial  # type: Trial
         sma = current_trial.sma
+        states = current_trial.states
+        state_timestamps = current_trial.state_timestamps
+
+        # visited state -> (start, end) of its visits, in the order of the first visit of each state
+        visits = {}
+        if len(state_timestamps) > 1:
+            for i, state in enumerate(states):
+                visits.setdefault(state, []).append((state_timestamps[i], state_timestamps[i + 1]))
+        else:
+            for state in states:
+                visits.setdefault(state, [])
+
+        occurrences = []
+        for state, durations in visits.items():
+            state_name = sma.state_names[state]
+            occurrences += [StateOccurrence(state_name, start, end) for start, end in durations]
 
-        visitedStates = [0] * current_trial.sma.total_states_added
-        # determine unique states while preserving visited order
-        uniqueStates = []
-        nUniqueStates = 0
-        uniqueStateIndexes = [0] * len(current_trial.states)
-
-        for i in range(len(current_trial.states)):
-            if current_trial.states[i] in uniqueStates:
-                uniqueStateIndexes[i] = uniqueStates.index(current_trial.states[i])
-            else:
-                uniqueStateIndexes[i] = nUniqueStates
-                nUniqueStates += 1
-                uniqueStates.append(current_trial.states[i])
-                visitedStates[current_trial.states[i]] = 1
-
-        # Create a 2-d matrix for each state in a list
-        uniqueStateDataMatrices = [[] for i in range(len(current_trial.states))]
-
-        # Append one matrix for each unique state
-        for i in range(len(current_trial.states)):
-            if len(current_trial.state_timestamps) > 1:
-                uniqueStateDataMatrices[uniqueStateIndexes[i]] += [
-                    (
-                        current_trial.state_timestamps[i],
-                        current_trial.state_timestamps[i + 1],
-                    )
-                ]
-
-        for i in range(nUniqueStates):
-            thisStateName = sma.state_names[uniqueStates[i]]
-
-            for state_dur in uniqueStateDataMatrices[i]:
-                self += StateOccurrence(thisStateName, state_dur[0], state_dur[1])
-
-        logger.debug("State names: %s", sma.state_names)
-        logger.debug("nPossibleStates: %s", sma.total_states_added)
         for i in range(sma.total_states_added):
-            thisStateName = sma.state_names[i]
-            if not visitedStates[i]:
-                self += StateOccurrence(thisStateName, float("NaN"), float("NaN"))
+            if i not in visits:
+                occurrences.append(StateOccurrence(sma.state_names[i], float("NaN"), float("NaN")))
 
-        logger.debug(
-            "Trial states: %s",
-            [str(state) for state in current_trial.states_occurrences],
-        )
+        self.add_messages(occurrences)
 
-        # save events occurrences on trial
-        # current_trial.events_occurrences = sma.raw_data.events_occurrences  # type: list
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("State names: %s", sma.state_names)
+            logger.debug("nPossibleStates: %s", sma.total_states_added)
+            logger.debug(
+                "Trial states: %s",
+                [str(state) for state in current_trial.states_occurrences],
+            )
 
-        logger.debug(
-            "Trial events: %s",
-            [str(event) for event in current_trial.events_occurrences],
-        )
+            # save events occurrences on trial
+            # current_trial.events_occurrences = sma.raw_data.events_occurrences  # type: list
+
+            logger.debug(
+                "Trial events: %s",
+                [str(event) for event in current_trial.events_occurrences],
+            )
+
+            logger.debug("Trial info: %s", str(current_trial))
 
-        logger.debug("Trial info: %s", str(current_trial))
+    def __remove_stored_trials_messages(self):
+        """
+        Remove from the history the messages older than the first trial in memory
+        """
+        self._trials_positions.append(len(self.history))
+
+        n_stored = len(self._trials_positions) - len(self.trials.in_memory)
+        if n_stored > 0:
+            del self._trials_positions[:n_stored]
+            start = self._trials_positions[0]
+            del self.history[:start]
+            self._trials_positions = [position - start for position in self._trials_positions]
 
     @property
     def current_trial(self):
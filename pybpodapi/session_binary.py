@@ -0,0 +1,231 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import struct
+
+import numpy as np
+
+from pybpodapi.com.messaging.end_trial import EndTrial
+from pybpodapi.com.messaging.event_occurrence import EventOccurrence
+from pybpodapi.com.messaging.event_resume import EventResume
+from pybpodapi.com.messaging.session_info import SessionInfo
+from pybpodapi.com.messaging.softcode_occurrence import SoftcodeOccurrence
+from pybpodapi.com.messaging.state_occurrence import StateOccurrence
+from pybpodapi.com.messaging.state_transition import StateTransition
+from pybpodapi.com.messaging.trial import Trial
+
+logger = logging.getLogger(__name__)
+
+#: First bytes of a binary session file
+BINARY_MAGIC = b"PYBPODBIN1"
+
+#: Record of a binary session file. The meaning of id depends on the kind of record (event id, state id or
+#: soft code), pc_time is the time of the computer in nanoseconds since the epoch, start and end are the Bpod
+#: timestamps in seconds (NaN if unknown)
+RECORD_DTYPE = np.dtype(
+    [
+        ("kind", "u1"),
+        ("id", "<i4"),
+        ("trial", "<i4"),
+        ("pc_time", "<i8"),
+        ("start", "<f8"),
+        ("end", "<f8"),
+    ]
+)
+
+#: Kinds of records
+KIND_TRIAL = 0
+KIND_END_TRIAL = 1
+KIND_EVENT = 2
+KIND_EVENT_SUMMARY = 3
+KIND_TRANSITION = 4
+KIND_STATE = 5
+KIND_SOFTCODE = 6
+#: Bpod times of the start and of the end of the trial, known at the end of the trial
+KIND_TRIAL_BPOD_TIME = 7
+
+# see Session.INFO_TRIAL_BPODTIME, the session module imports this module
+_INFO_TRIAL_BPODTIME = "TRIAL-BPOD-TIME"
+
+# chunk type, payload length
+_CHUNK_HEADER = struct.Struct("<BI")
+_CHUNK_RECORDS = 0
+_CHUNK_NAMES = 1
+
+_NAN = float("NaN")
+
+
+def read_session_binary(path):
+    """
+    Read a binary session file
+
+    Example:
+
+    .. code-block:: python
+
+        records, names = read_session_binary('session.bin')
+        pokes = records[(records['kind'] == KIND_EVENT) & (records['id'] == 80)]
+        print(names['events'][80], pokes['start'])
+
+    :param str path: binary session file
+    :return: the records (see :data:`RECORD_DTYPE`) and the names of the event ids and of the state ids
+        (``{'events': {id: name}, 'states': {id: name}}``)
+    :rtype: tuple(numpy.ndarray, dict)
+    """
+    with open(path, "rb") as infile:
+        data = memoryview(infile.read())
+
+    if data[: len(BINARY_MAGIC)] != BINARY_MAGIC:
+        raise ValueError("{0} is not a binary session file".format(path))
+
+    chunks = []
+    names = {"events": {}, "states": {}}
+    position = len(BINARY_MAGIC)
+    while position + _CHUNK_HEADER.size <= len(data):
+        chunk_type, length = _CHUNK_HEADER.unpack_from(data, position)
+        position += _CHUNK_HEADER.size
+        if position + length > len(data):
+            break  # truncated chunk, the session was interrupted
+
+        payload = data[position : position + length]
+        if chunk_type == _CHUNK_RECORDS:
+            chunks.append(np.frombuffer(payload, RECORD_DTYPE))
+        elif chunk_type == _CHUNK_NAMES:
+            for names_kind, name_id, name in json.loads(bytes(payload).decode("utf-8")):
+                names[names_kind][name_id] = name
+        position += length
+
+    records = np.concatenate(chunks) if chunks else np.empty(0, RECORD_DTYPE)
+    return records, names
+
+
+class SessionBinaryWriter(object):
+    """
+    Writes the trials data of a session into an append-only binary file, read with :func:`read_session_binary`.
+
+    The file contains the trials, events, transitions, states, soft codes and the Bpod times of the trials, the
+    other session messages are only written in the session csv file.
+    The Bpod times of a trial are only known at its end, they are in a :data:`KIND_TRIAL_BPOD_TIME` record. The records are written in chunks, at the end of each trial or when
+    buffer_size records are waiting. The state names are given ids in the order they appear in the file.
+    """
+
+    def __init__(self, path, buffer_size=1000):
+        """
+        :param str path: file to create
+        :param int buffer_size: maximum number of records waiting to be written
+        """
+        self.path = path
+        self.buffer_size = buffer_size
+
+        self._file = open(path, "wb")
+        self._file.write(BINARY_MAGIC)
+
+        self._records = []
+        self._trial = -1
+        self._names_ids = {"events": {}, "states": {}}  # name kind -> name -> id
+        self._new_names = []  # names not written yet
+
+        # message class -> function returning the (kind, id, start, end) of the record, or None to skip the message
+        self._encoders = {
+            Trial: self.__encode_trial,
+            EndTrial: self.__encode_end_trial,
+            EventOccurrence: self.__encode_event,
+            EventResume: self.__encode_event_summary,
+            StateTransition: self.__encode_transition,
+            StateOccurrence: self.__encode_state,
+            SoftcodeOccurrence: self.__encode_softcode,
+            SessionInfo: self.__encode_session_info,
+        }
+
+    def add(self, msg):
+        """
+        Add a message to the file, the messages without trials data are ignored
+
+        :param BaseMessage msg: session message
+        """
+        encoder = self._encoders.get(type(msg))
+        record = encoder(msg) if encoder is not None else None
+        if record is None:
+            return
+
+        kind, record_id, start, end = record
+        self._records.append(
+            (
+                kind,
+                record_id,
+                self._trial,
+                msg.pc_timestamp_ns,
+                _NAN if start is None else start,
+                _NAN if end is None else end,
+            )
+        )
+
+        if kind == KIND_END_TRIAL or len(self._records) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the waiting records
+        """
+        if self._new_names:
+            self.__write_chunk(_CHUNK_NAMES, json.dumps(self._new_names).encode("utf-8"))
+            self._new_names = []
+
+        if self._records:
+            self.__write_chunk(_CHUNK_RECORDS, np.array(self._records, dtype=RECORD_DTYPE).tobytes())
+            self._records = []
+
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __write_chunk(self, chunk_type, payload):
+        self._file.write(_CHUNK_HEADER.pack(chunk_type, len(payload)))
+        self._file.write(payload)
+
+    def __get_name_id(self, names_kind, name, name_id=None):
+        """
+        Id of a name, registering the names not seen before
+
+        :param str names_kind: 'events' or 'states'
+        :param int name_id: id to register for a new name, by default the next free id
+        """
+        ids = self._names_ids[names_kind]
+        if name not in ids:
+            ids[name] = len(ids) if name_id is None else name_id
+            self._new_names.append((names_kind, ids[name], name))
+        return ids[name]
+
+    def __encode_trial(self, msg):
+        self._trial += 1
+        return KIND_TRIAL, -1, None, None
+
+    def __encode_end_trial(self, msg):
+        return KIND_END_TRIAL, -1, None, None
+
+    def __encode_event(self, msg):
+        self.__get_name_id("events", msg.event_name, msg.event_id)
+        return KIND_EVENT, msg.event_id, msg.host_timestamp, None
+
+    def __encode_event_summary(self, msg):
+        self.__get_name_id("events", msg.event_name, msg.event_id)
+        return KIND_EVENT_SUMMARY, msg.event_id, msg.host_timestamp, None
+
+    def __encode_transition(self, msg):
+        return KIND_TRANSITION, self.__get_name_id("states", msg.state_name), msg.host_timestamp, None
+
+    def __encode_state(self, msg):
+        return KIND_STATE, self.__get_name_id("states", msg.state_name), msg.start_timestamp, msg.end_timestamp
+
+    def __encode_softcode(self, msg):
+        return KIND_SOFTCODE, msg.softcode, None, None
+
+    def __encode_session_info(self, msg):
+        if msg.infoname != _INFO_TRIAL_BPODTIME:
+            return None
+        return KIND_TRIAL_BPOD_TIME, -1, msg.host_timestamp, msg.endtime
@@ -0,0 +1,176 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import csv
+import logging
+import numpy as np
+
+from pybpodapi.com.messaging.event_occurrence import EventOccurrence
+from pybpodapi.com.messaging.event_resume import EventResume
+from pybpodapi.com.messaging.parser import MessageParser
+from pybpodapi.com.messaging.session_info import SessionInfo
+from pybpodapi.com.messaging.softcode_occurrence import SoftcodeOccurrence
+from pybpodapi.com.messaging.state_occurrence import StateOccurrence
+from pybpodapi.com.messaging.trial import Trial
+from pybpodapi.utils import date_parser
+
+logger = logging.getLogger(__name__)
+
+#: Events of a trial loaded by :func:`load_session`
+EVENTS_DTYPE = np.dtype([("id", "<i4"), ("timestamp", "<f8")])
+
+#: States occurrences of a trial loaded by :func:`load_session`, the state is an index in TrialData.states_names
+STATES_DTYPE = np.dtype([("state", "<i4"), ("start", "<f8"), ("end", "<f8")])
+
+# see Session.INFO_TRIAL_BPODTIME, the session module is not imported to load files without the csv writer
+_INFO_TRIAL_BPODTIME = "TRIAL-BPOD-TIME"
+
+_NAN = float("NaN")
+
+
+def iter_session_messages(path):
+    """
+    Read the messages of a session file one by one
+
+    :param str path: session file
+    :return: iterator of messages, the rows of unknown types are skipped
+    :rtype: iterator(BaseMessage)
+    """
+    parser = MessageParser()
+    with open(path, newline="") as infile:
+        for row in csv.reader(infile, delimiter=MessageParser.COLUMN_SEPARATOR):
+            msg = parser.fromlist(row) if row else None
+            if msg is not None:
+                yield msg
+
+
+def load_session(path):
+    """
+    Load the trials of a session file into numpy arrays
+
+    Only the rows with the trials data are converted, the others are skipped without being parsed.
+
+    Example:
+
+    .. code-block:: python
+
+        for trial in load_session('session.csv'):
+            pokes = trial.events[trial.events['id'] == 80]['timestamp']
+
+    :param str path: session file
+    :rtype: list(TrialData)
+    """
+    return SessionLoader().load(path)
+
+
+class TrialData(object):
+    """
+    Data of a trial loaded by :func:`load_session`
+
+    :ivar datetime pc_timestamp: time of the computer at the start of the trial
+    :ivar float bpod_start_timestamp: Bpod time at the start of the trial
+    :ivar float bpod_end_timestamp: Bpod time at the end of the trial
+    :ivar numpy.ndarray events: events of the trial (see :data:`EVENTS_DTYPE`)
+    :ivar numpy.ndarray states: states occurrences of the trial (see :data:`STATES_DTYPE`), NaN for the states not
+        visited
+    :ivar list(str) states_names: names of the states, indexed by the column state of the states array
+    :ivar list(int) softcodes: soft codes received during the trial
+    """
+
+    def __init__(self, pc_timestamp):
+        self.pc_timestamp = pc_timestamp
+        self.bpod_start_timestamp = None
+        self.bpod_end_timestamp = None
+        self.events = None
+        self.states = None
+        self.states_names = []
+        self.softcodes = []
+
+
+class SessionLoader(object):
+    """
+    Reads a session file row by row, the rows are handled by a function chosen by their type
+    """
+
+    def __init__(self):
+        # message type -> function handling the row
+        self._handlers = {
+            Trial.MESSAGE_TYPE_ALIAS: self.__trial,
+            EventOccurrence.MESSAGE_TYPE_ALIAS: self.__event,
+            EventResume.MESSAGE_TYPE_ALIAS: self.__event_summary,
+            "EVENT-RESUME": self.__event_summary,
+            StateOccurrence.MESSAGE_TYPE_ALIAS: self.__state,
+            SoftcodeOccurrence.MESSAGE_TYPE_ALIAS: self.__softcode,
+            SessionInfo.MESSAGE_TYPE_ALIAS: self.__info,
+        }
+
+        self.trials = []
+        self._trial = None
+        self._events = []
+        self._events_summary = []
+        self._states = []
+        self._states_indexes = {}  # state name -> index in states_names
+
+    def load(self, path):
+        """
+        :param str path: session file
+        :rtype: list(TrialData)
+        """
+        self.trials = []
+        self._trial = None
+
+        handlers = self._handlers
+        trial_handler = handlers[Trial.MESSAGE_TYPE_ALIAS]
+        with open(path, newline="") as infile:
+            for row in csv.reader(infile, delimiter=MessageParser.COLUMN_SEPARATOR):
+                handler = handlers.get(row[0]) if row else None
+                # the rows before the first trial are skipped
+                if handler is not None and (self._trial is not None or handler == trial_handler):
+                    handler(row)
+
+        self.__finish_trial()
+        return self.trials
+
+    def __trial(self, row):
+        self.__finish_trial()
+
+        self._trial = TrialData(date_parser.parse(row[1]))
+        self.trials.append(self._trial)
+        self._events = []
+        self._events_summary = []
+        self._states = []
+        self._states_indexes = {}  # state name -> index in states_names
+
+    def __finish_trial(self):
+        """
+        Convert the data of the current trial to numpy arrays. The states and the events summary are written after
+        the END-TRIAL message, so a trial is completed when the next trial starts or when the file ends.
+        """
+        if self._trial is None:
+            return
+        # the events summary has the timestamps of the events when they are not sent during the trial
+        self._trial.events = np.array(self._events_summary or self._events, dtype=EVENTS_DTYPE)
+        self._trial.states = np.array(self._states, dtype=STATES_DTYPE)
+        self._trial = None
+
+    def __event(self, row):
+        self._events.append((int(row[4]), float(row[2]) if row[2] else _NAN))
+
+    def __event_summary(self, row):
+        self._events_summary.append((int(row[4]), float(row[2]) if row[2] else _NAN))
+
+    def __state(self, row):
+        name = row[4]
+        index = self._states_indexes.get(name)
+        if index is None:
+            index = self._states_indexes[name] = len(self._trial.states_names)
+            self._trial.states_names.append(name)
+        self._states.append((index, float(row[2]) if row[2] else _NAN, float(row[3]) if row[3] else _NAN))
+
+    def __softcode(self, row):
+        self._trial.softcodes.append(int(row[4]))
+
+    def __info(self, row):
+        if row[4] == _INFO_TRIAL_BPODTIME:
+            self._trial.bpod_start_timestamp = float(row[2]) if row[2] else None
+            self._trial.bpod_end_timestamp = float(row[3]) if row[3] else None
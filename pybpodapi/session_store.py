@@ -0,0 +1,116 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import copy
+import logging
+import pickle
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+class TrialStore(object):
+    """
+    List of the trials of a session keeping only the last ones in memory.
+
+    When more than keep_trials trials are appended, the oldest trials are pickled into a file and removed from
+    memory. They can still be read with the usual list operations (``trials[i]``, slices, iteration), which load
+    them from the file.
+
+    .. note:: The trials loaded from the file do not keep their state machine (their ``sma`` is None). The names
+              of their events are resolved before they are stored, so the methods using them (e.g.
+              :meth:`pybpodapi.com.messaging.trial.Trial.export`) are still available.
+    """
+
+    def __init__(self, keep_trials, path=None):
+        """
+        :param int keep_trials: number of trials kept in memory (at least 1)
+        :param str path: file where the old trials are stored, if None a temporary file is used
+        """
+        self.keep_trials = max(keep_trials, 1)
+        self.path = path
+
+        self.in_memory = []  # type: list(Trial)
+        self._offsets = []  # position of each stored trial in the file
+        self._file = None
+
+    def append(self, trial):
+        """
+        Add a trial, storing the oldest trial in the file if there are too many trials in memory
+
+        :param Trial trial: new trial
+        """
+        self.in_memory.append(trial)
+        while len(self.in_memory) > self.keep_trials:
+            self.__store(self.in_memory.pop(0))
+
+    def load(self, index):
+        """
+        Read a trial from the file
+
+        :param int index: index of a trial which is not in memory
+        :rtype: Trial
+        """
+        self._file.flush()
+        self._file.seek(self._offsets[index])
+        trial = pickle.load(self._file)
+        self._file.seek(0, 2)
+        return trial
+
+    def close(self):
+        """
+        Close the file of the stored trials
+        """
+        if self._file is not None:
+            self._file.close()
+
+    @property
+    def n_stored(self):
+        """
+        Number of trials stored in the file
+
+        :rtype: int
+        """
+        return len(self._offsets)
+
+    def __len__(self):
+        return len(self._offsets) + len(self.in_memory)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        index = self.__index(index)
+        if index < len(self._offsets):
+            return self.load(index)
+        return self.in_memory[index - len(self._offsets)]
+
+    def __setitem__(self, index, value):
+        index = self.__index(index)
+        if index < len(self._offsets):
+            raise IndexError("trial {0} is not in memory".format(index))
+        self.in_memory[index - len(self._offsets)] = value
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __index(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("trial index out of range")
+        return index
+
+    def __store(self, trial):
+        if self._file is None:
+            self._file = open(self.path, "w+b") if self.path else tempfile.TemporaryFile()
+
+        # the state machine references the hardware and is not needed to read the trial data, once the names of
+        # the events are resolved
+        trial.get_events_names()
+        trial = copy.copy(trial)
+        trial.sma = None
+
+        self._offsets.append(self._file.tell())
+        pickle.dump(trial, self._file, pickle.HIGHEST_PROTOCOL)
@@ -13,6 +13,41 @@ PYBPOD_API_STREAM2STDOUT = True
 # accept commands from the stdin
 PYBPOD_API_ACCEPT_STDIN = False
 
+# read the serial port on a background thread into a ring buffer of the given size (bytes)
+PYBPOD_API_SERIAL_READER_THREAD = False
+PYBPOD_API_SERIAL_BUFFER_SIZE = 1048576
+
+# sleep while a trial runs until serial data, a command or the next loop_handler call (period in seconds) is due,
+# instead of polling in a busy loop. It implies the use of the serial reader thread.
+PYBPOD_API_EVENT_DRIVEN_LOOP = False
+PYBPOD_API_LOOP_HANDLER_PERIOD = 0.01
+
+# record all the serial traffic into this file, to replay it later with 'replay://<file>' as serial port, as fast as
+# possible, or with 'replay://<file>?realtime=1' at the original pace
+PYBPOD_API_CAPTURE_FILE = None
+
+# queue the commands sent to Bpod and write them together at most this number of seconds later (None sends them
+# immediately). Commands are always flushed before reading an answer. See also Bpod.batch()
+PYBPOD_API_COALESCE_WRITES_DELAY = None
+
+# skip the upload of a state machine identical to the one already installed on Bpod
+PYBPOD_API_CACHE_STATE_MACHINE = False
+
+# write the session file on a background thread. The rows wait in a queue of the given size, and the file is
+# flushed every BATCH_SIZE rows or at most FLUSH_INTERVAL seconds after a row is written
+PYBPOD_API_SESSION_WRITER_THREAD = False
+PYBPOD_API_SESSION_WRITER_QUEUE_SIZE = 10000
+PYBPOD_API_SESSION_WRITER_BATCH_SIZE = 100
+PYBPOD_API_SESSION_WRITER_FLUSH_INTERVAL = 0.5
+
+# keep only this number of trials in memory (None keeps all of them). The older trials are moved to a temporary
+# file (see pybpodapi.session_store.TrialStore) and their messages are removed from the session history
+PYBPOD_API_SESSION_KEEP_TRIALS = None
+
+# also write the trials data in a binary file next to the session file, with the extension .bin
+# (see pybpodapi.session_binary.read_session_binary)
+PYBPOD_API_SESSION_BINARY_FILE = False
+
 # SUPPORTED BPOD FIRMWARE VERSION
 # TARGET_BPOD_FIRMWARE_VERSION = "9"  # 0.7.5
 # TARGET_BPOD_FIRMWARE_VERSION = "13" # 0.7.9
@@ -21,6 +56,10 @@ PYBPOD_API_ACCEPT_STDIN = False
 TARGET_BPOD_FIRMWARE_VERSION = "22"
 
 PYBPOD_SERIAL_PORT = None
+# transport used to talk with the device: 'serial', 'tcp', 'pty' or 'replay'. If None it is deduced from the port,
+# e.g. 'tcp://192.168.0.10:4000', 'pty:///dev/pts/3' or 'replay:///path/to/capture?realtime=1'
+# (see pybpodapi.com.transports.create_transport)
+PYBPOD_TRANSPORT = None
 PYBPOD_NET_PORT = None
 PYBPOD_BAUDRATE = 1312500
 PYBPOD_SYNC_CHANNEL = 255
@@ -79,15 +79,23 @@ class StateMachineBase(object):
 
         # List of states that have been added to the state machine
         self.manifest = []  # type: list(str)
+        self._manifest_indexes = {}  # type: dict(str, int)
 
         # List of states that have been referenced but not yet added
         self.undeclared = []  # type:list(str)
+        # placeholder number of each undeclared state and the slots (list, position) where it was written,
+        # so update_state_numbers only visits the references to replace
+        self._undeclared_numbers = {}  # type: dict(str, int)
+        self._undeclared_slots = {}  # type: dict(int, list(tuple))
 
         # output actions
         self.output_matrix = [[] for i in range(self.hardware.max_states)]
 
         self.is_running = False
 
+        # why the states, transitions and outputs cannot be modified anymore, None while they can be modified
+        self.read_only_reason = None  # type: str
+
     def add_state(
         self, state_name, state_timer=0, state_change_conditions={}, output_actions=()
     ):
@@ -111,13 +119,16 @@ class StateMachineBase(object):
 
         """
 
+        self.__check_modifiable()
+
         # TODO: WHY DO WE NEED THIS IF-ELSE?
-        if state_name not in self.manifest:
+        if state_name not in self._manifest_indexes:
             self.state_names.append(state_name)
             self.manifest.append(state_name)
             state_name_idx = len(self.manifest) - 1
+            self._manifest_indexes[state_name] = state_name_idx
         else:
-            state_name_idx = self.manifest.index(state_name)
+            state_name_idx = self._manifest_indexes[state_name]
             self.state_names[state_name_idx] = state_name
 
         self.state_timer_matrix[state_name_idx] = state_name_idx
@@ -126,7 +137,7 @@ class StateMachineBase(object):
 
         for event_name, event_state_transition in state_change_conditions.items():
             try:
-                event_code = self.hardware.channels.event_names.index(event_name)
+                event_code = self.hardware.channels.get_event_index(event_name)
                 logger.debug("Event code: %s", event_code)
             except:
                 raise SMAError(
@@ -137,8 +148,8 @@ class StateMachineBase(object):
                     + " is an invalid event name."
                 )
 
-            if event_state_transition in self.manifest:
-                destination_state_number = self.manifest.index(event_state_transition)
+            if event_state_transition in self._manifest_indexes:
+                destination_state_number = self._manifest_indexes[event_state_transition]
             else:
                 if event_state_transition in ["exit", ">exit"]:
                     destination_state_number = float("NaN")
@@ -147,20 +158,28 @@ class StateMachineBase(object):
                     self.use_255_back_signal = True
                     destination_state_number = 255
                 else:  # Send to an undeclared state (replaced later with actual state in myBpod.sendStateMachine)
-                    self.undeclared.append(event_state_transition)
-                    destination_state_number = (len(self.undeclared) - 1) + 10000
+                    destination_state_number = self.__get_undeclared_state_number(
+                        event_state_transition
+                    )
 
             if EventName.is_state_timer(event_name):
                 self.state_timer_matrix[state_name_idx] = destination_state_number
+                self.__register_undeclared_slot(
+                    destination_state_number, self.state_timer_matrix, state_name_idx
+                )
 
             elif EventName.is_condition(event_name):
-                self.conditions.matrix[state_name_idx].append(
-                    (event_code, destination_state_number)
+                self.__add_transition(
+                    self.conditions.matrix[state_name_idx],
+                    event_code,
+                    destination_state_number,
                 )
 
             elif EventName.is_global_counter_end(event_name):
-                self.global_counters.matrix[state_name_idx].append(
-                    (event_code, destination_state_number)
+                self.__add_transition(
+                    self.global_counters.matrix[state_name_idx],
+                    event_code,
+                    destination_state_number,
                 )
 
             elif EventName.is_global_timer_trigger(event_name):
@@ -181,41 +200,47 @@ class StateMachineBase(object):
                 self.global_timers.end_matrix[state_name_idx] = v
 
             elif EventName.is_global_timer_end(event_name):
-                self.global_timers.end_matrix[state_name_idx].append(
-                    (event_code, destination_state_number)
+                self.__add_transition(
+                    self.global_timers.end_matrix[state_name_idx],
+                    event_code,
+                    destination_state_number,
                 )
 
             elif EventName.is_global_timer_start(event_name):
-                self.global_timers.start_matrix[state_name_idx].append(
-                    (event_code, destination_state_number)
+                self.__add_transition(
+                    self.global_timers.start_matrix[state_name_idx],
+                    event_code,
+                    destination_state_number,
                 )
 
             else:
-                self.input_matrix[state_name_idx].append(
-                    (event_code, destination_state_number)
+                self.__add_transition(
+                    self.input_matrix[state_name_idx],
+                    event_code,
+                    destination_state_number,
                 )
 
         for action_name, action_value in output_actions:
             if action_name == "Valve":
-                output_code = self.hardware.channels.output_channel_names.index(
+                output_code = self.hardware.channels.get_output_channel_index(
                     OutputChannel.Valve + str(action_value)
                 )
                 output_value = 1
 
                 """
                 elif action_name == 'ValveState':
-                    output_code  = self.hardware.channels.output_channel_names.index( OutputChannel.Valve+str(action_value))
+                    output_code  = self.hardware.channels.get_output_channel_index( OutputChannel.Valve+str(action_value))
                     output_value = math.pow(2, action_value - 1)
                 """
             elif action_name == OutputChannel.LED:
-                output_code = self.hardware.channels.output_channel_names.index(
+                output_code = self.hardware.channels.get_output_channel_index(
                     ChannelName.PWM + str(action_value)
                 )
                 output_value = 255
 
             else:
                 try:
-                    output_code = self.hardware.channels.output_channel_names.index(
+                    output_code = self.hardware.channels.get_output_channel_index(
                         action_name
                     )
                 except:
@@ -249,6 +274,38 @@ class StateMachineBase(object):
 
         self.total_states_added += 1
 
+    def __get_undeclared_state_number(self, state_name):
+        """
+        Placeholder number of a state referenced before being added (10000 + its position in undeclared)
+
+        :param str state_name: name of the referenced state
+        :rtype: int
+        """
+        state_number = self._undeclared_numbers.get(state_name)
+        if state_number is None:
+            self.undeclared.append(state_name)
+            state_number = (len(self.undeclared) - 1) + 10000
+            self._undeclared_numbers[state_name] = state_number
+            self._undeclared_slots[state_number] = []
+        return state_number
+
+    def __register_undeclared_slot(self, state_number, container, position):
+        """
+        Remember where a placeholder state number was written, to replace it in update_state_numbers
+        """
+        slots = self._undeclared_slots.get(state_number)
+        if slots is not None:
+            slots.append((container, position))
+
+    def __add_transition(self, transitions, event_code, destination_state_number):
+        """
+        Append an (event code, destination state) transition to a state transitions list
+        """
+        transitions.append((event_code, destination_state_number))
+        self.__register_undeclared_slot(
+            destination_state_number, transitions, len(transitions) - 1
+        )
+
     def set_global_timer_legacy(self, timer_id=None, timer_duration=None):
         """
         Set global timer (legacy version)
@@ -256,6 +313,7 @@ class StateMachineBase(object):
         :param int timer_ID:
         :param float timer_duration: timer duration in seconds
         """
+        self.__check_modifiable()
         self.global_timers.timers[timer_id - 1] = timer_duration
 
     def set_global_timer(
@@ -281,10 +339,12 @@ class StateMachineBase(object):
         :param str channel: channel/port name Ex: 'PWM2'
         :param int on_message:
         """
+        self.__check_modifiable()
+
         timer_channel_idx = 255
         if channel is not None:
             try:
-                timer_channel_idx = self.hardware.channels.output_channel_names.index(
+                timer_channel_idx = self.hardware.channels.get_output_channel_index(
                     channel
                 )  # type: int
             except:
@@ -322,7 +382,8 @@ class StateMachineBase(object):
         :param str target_event: port where to listen for event to count
         :param int threshold: number of times that should be count until trigger timer
         """
-        event_code = self.hardware.channels.event_names.index(target_event)
+        self.__check_modifiable()
+        event_code = self.hardware.channels.get_event_index(target_event)
         self.global_counters.attached_events[counter_number - 1] = event_code
         self.global_counters.thresholds[counter_number - 1] = threshold
 
@@ -334,12 +395,18 @@ class StateMachineBase(object):
         :param str condition_channel:
         :param int channel_value:
         """
-        channel_code = self.hardware.channels.input_channel_names.index(
+        self.__check_modifiable()
+        channel_code = self.hardware.channels.get_input_channel_index(
             condition_channel
         )
         self.conditions.channels[condition_number - 1] = channel_code
         self.conditions.values[condition_number - 1] = channel_value
 
 
+    def __check_modifiable(self):
+        if self.read_only_reason is not None:
+            raise SMAError("Error: the state machine cannot be modified, {0}.".format(self.read_only_reason))
+
+
 class SMAError(Exception):
     pass
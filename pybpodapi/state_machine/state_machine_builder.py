@@ -2,7 +2,9 @@
 # -*- coding: utf-8 -*-
 
 import logging
-import math
+from itertools import chain
+
+import numpy as np
 from pybpodapi.com.arcom import ArduinoTypes
 
 from pybpodapi.com.protocol.send_msg_headers import SendMessageHeader
@@ -10,6 +12,10 @@ from pybpodapi.state_machine.state_machine_base import StateMachineBase
 
 logger = logging.getLogger(__name__)
 
+#: Number of states from which a state machine is serialized with numpy. The fixed cost of the numpy calls is
+#: higher than the cost of serializing the smaller state machines with Python lists.
+NUMPY_MIN_STATES = 128
+
 
 class StateMachineBuilder(StateMachineBase):
     """
@@ -22,52 +28,23 @@ class StateMachineBuilder(StateMachineBase):
         """
         Replace undeclared states (at the time they were referenced) with actual state numbers
         """
-        for i in range(len(self.undeclared)):
-            undeclaredStateNumber = i + 10000
-            thisStateNumber = self.manifest.index(self.undeclared[i])
-            for j in range(self.total_states_added):
-                if self.state_timer_matrix[j] == undeclaredStateNumber:
-                    self.state_timer_matrix[j] = thisStateNumber
-
-                # input matrix
-                inputTransitions = self.input_matrix[j]
-                for k in range(0, len(inputTransitions)):
-                    thisTransition = inputTransitions[k]
-                    if thisTransition[1] == undeclaredStateNumber:
-                        inputTransitions[k] = (thisTransition[0], thisStateNumber)
-                self.input_matrix[j] = inputTransitions
-
-                # start matrix
-                inputTransitions = self.global_timers.start_matrix[j]
-                for k in range(0, len(inputTransitions)):
-                    thisTransition = inputTransitions[k]
-                    if thisTransition[1] == undeclaredStateNumber:
-                        inputTransitions[k] = (thisTransition[0], thisStateNumber)
-                self.global_timers.start_matrix[j] = inputTransitions
-
-                # end matrix
-                inputTransitions = self.global_timers.end_matrix[j]
-                for k in range(0, len(inputTransitions)):
-                    thisTransition = inputTransitions[k]
-                    if thisTransition[1] == undeclaredStateNumber:
-                        inputTransitions[k] = (thisTransition[0], thisStateNumber)
-                self.global_timers.end_matrix[j] = inputTransitions
-
-                # global counters
-                inputTransitions = self.global_counters.matrix[j]
-                for k in range(0, len(inputTransitions)):
-                    thisTransition = inputTransitions[k]
-                    if thisTransition[1] == undeclaredStateNumber:
-                        inputTransitions[k] = (thisTransition[0], thisStateNumber)
-                self.global_counters.matrix[j] = inputTransitions
-
-                # conditions
-                inputTransitions = self.conditions.matrix[j]
-                for k in range(0, len(inputTransitions)):
-                    thisTransition = inputTransitions[k]
-                    if thisTransition[1] == undeclaredStateNumber:
-                        inputTransitions[k] = (thisTransition[0], thisStateNumber)
-                self.conditions.matrix[j] = inputTransitions
+        for state_name, undeclared_state_number in self._undeclared_numbers.items():
+            this_state_number = self._manifest_indexes.get(state_name)
+            if this_state_number is None:
+                raise StateMachineBuilderError(
+                    "Error: state {0} was referenced by name, but not subsequently declared.".format(
+                        state_name
+                    )
+                )
+
+            # only the slots where the placeholder was written are visited
+            for container, position in self._undeclared_slots[undeclared_state_number]:
+                value = container[position]
+                if isinstance(value, tuple):
+                    if value[1] == undeclared_state_number:
+                        container[position] = (value[0], this_state_number)
+                elif value == undeclared_state_number:
+                    container[position] = this_state_number
 
         # Check to make sure all states in manifest exist
         logger.debug(
@@ -93,7 +70,85 @@ class StateMachineBuilder(StateMachineBase):
         """
         Builds state machine to send to Bpod box
 
-        :rtype: list(int)
+        :rtype: bytes
+        """
+        self.__update_used_indexes()
+        if self.total_states_added < NUMPY_MIN_STATES:
+            return np.array(self.__message_list(), dtype=np.uint8).tobytes()
+
+        matrices = self.__flatten_matrices()
+        message = np.zeros(self.__message_size(matrices), dtype=np.uint8)
+        self.__write_message(message, matrices)
+        return message.tobytes()
+
+    def build_message_global_timer(self):
+        """
+        Builds the global timers triggers, cancels and onset triggers message (8, 16 or 32 bits values depending on the
+        number of global timers of the hardware)
+
+        :rtype: bytes
+        """
+        if self.total_states_added < NUMPY_MIN_STATES:
+            return np.array(self.__message_global_timer_list(), dtype=self.__global_timer_dtype()).tobytes()
+
+        message = np.empty(self.__message_global_timer_size(), dtype=self.__global_timer_dtype())
+        self.__write_message_global_timer(message)
+        return message.tobytes()
+
+    def build_message_32_bits(self):
+        """
+        Builds a 32 bit message to send to Bpod box
+
+        :rtype: bytes
+        """
+        if self.total_states_added < NUMPY_MIN_STATES:
+            return np.array(self.__message_32_bits_list(), dtype=np.uint32).tobytes()
+
+        message = np.empty(self.__message_32_bits_size(), dtype=np.uint32)
+        self.__write_message_32_bits(message)
+        return message.tobytes()
+
+    def build_body(self):
+        """
+        Builds the whole state machine message sent after the header, the concatenation of :meth:`build_message`,
+        :meth:`build_message_global_timer` and :meth:`build_message_32_bits`, into one preallocated buffer
+
+        :rtype: bytes
+        """
+        self.__update_used_indexes()
+        if self.total_states_added < NUMPY_MIN_STATES:
+            return (
+                np.array(self.__message_list(), dtype=np.uint8).tobytes()
+                + np.array(self.__message_global_timer_list(), dtype=self.__global_timer_dtype()).tobytes()
+                + np.array(self.__message_32_bits_list(), dtype=np.uint32).tobytes()
+            )
+
+        matrices = self.__flatten_matrices()
+        global_timer_dtype = np.dtype(self.__global_timer_dtype())
+
+        message_size = self.__message_size(matrices)
+        global_timer_size = self.__message_global_timer_size()
+        thirty_two_bits_size = self.__message_32_bits_size()
+
+        body = bytearray(
+            message_size + global_timer_size * global_timer_dtype.itemsize + thirty_two_bits_size * 4
+        )
+        offset = 0
+        self.__write_message(np.frombuffer(body, dtype=np.uint8, count=message_size, offset=offset), matrices)
+        offset += message_size
+        self.__write_message_global_timer(
+            np.frombuffer(body, dtype=global_timer_dtype, count=global_timer_size, offset=offset)
+        )
+        offset += global_timer_size * global_timer_dtype.itemsize
+        self.__write_message_32_bits(
+            np.frombuffer(body, dtype=np.uint32, count=thirty_two_bits_size, offset=offset)
+        )
+
+        return bytes(body)
+
+    def __update_used_indexes(self):
+        """
+        Find the number of global timers, counters and conditions used
         """
         self.highest_used_global_counter = self.global_counters.get_max_index_used()
         self.highest_used_global_timer = self.global_timers.get_max_index_used()
@@ -115,261 +170,324 @@ class StateMachineBuilder(StateMachineBase):
             else self.highest_used_global_condition + 1
         )
 
-        message = [
-            self.total_states_added,
-            self.highest_used_global_timer,
-            self.highest_used_global_counter,
-            self.highest_used_global_condition,
+        self.state_timers = self.state_timers[: self.total_states_added]
+
+    def __flatten_matrices(self):
+        """
+        Flatten the transition matrices with numpy
+
+        :return: number of pairs per state, codes and values of the input, output, global timer start,
+                 global timer end, global counter and condition matrices
+        :rtype: list(tuple(numpy.ndarray))
+        """
+        n_states = self.total_states_added
+        positions = self.hardware.channels.events_positions
+
+        # exit destinations (NaN) are sent as the number of states
+        return [
+            _flatten_pairs(self.input_matrix[:n_states], exit_state=n_states),
+            # the global timers triggers and cancels are sent in the global timer message
+            _flatten_pairs(self.output_matrix[:n_states], max_code=positions.globalTimerTrigger),
+            _flatten_pairs(
+                self.global_timers.start_matrix[:n_states],
+                code_offset=positions.globalTimerStart,
+                exit_state=n_states,
+            ),
+            _flatten_pairs(
+                self.global_timers.end_matrix[:n_states],
+                code_offset=positions.globalTimerEnd,
+                exit_state=n_states,
+            ),
+            _flatten_pairs(
+                self.global_counters.matrix[:n_states],
+                code_offset=positions.globalCounter,
+                exit_state=n_states,
+            ),
+            _flatten_pairs(
+                self.conditions.matrix[:n_states],
+                code_offset=positions.condition,
+                exit_state=n_states,
+            ),
         ]
 
+    def __message_list(self):
+        """
+        States, transitions, outputs, global timers, global counters and conditions settings, built with Python
+        lists for the small state machines (see :meth:`__write_message`)
+
+        :rtype: list(int)
+        """
+        n_states = self.total_states_added
+        n_timers = self.highest_used_global_timer
+        n_counters = self.highest_used_global_counter
+        n_conditions = self.highest_used_global_condition
+        positions = self.hardware.channels.events_positions
+
+        message = [n_states, n_timers, n_counters, n_conditions]
+        message += [n_states if timer != timer else timer for timer in self.state_timer_matrix[:n_states]]
+
+        _append_pairs(message, self.input_matrix[:n_states], exit_state=n_states)
+        _append_pairs(message, self.output_matrix[:n_states], max_code=positions.globalTimerTrigger)
+        _append_pairs(
+            message,
+            self.global_timers.start_matrix[:n_states],
+            code_offset=positions.globalTimerStart,
+            exit_state=n_states,
+        )
+        _append_pairs(
+            message,
+            self.global_timers.end_matrix[:n_states],
+            code_offset=positions.globalTimerEnd,
+            exit_state=n_states,
+        )
+        _append_pairs(
+            message,
+            self.global_counters.matrix[:n_states],
+            code_offset=positions.globalCounter,
+            exit_state=n_states,
+        )
+        _append_pairs(
+            message,
+            self.conditions.matrix[:n_states],
+            code_offset=positions.condition,
+            exit_state=n_states,
+        )
+
+        message += self.global_timers.channels[:n_timers]
+        message += [255 if value == 0 else value for value in self.global_timers.on_messages[:n_timers]]
+        message += [255 if value == 0 else value for value in self.global_timers.off_messages[:n_timers]]
+        message += self.global_timers.loop_mode[:n_timers]
+        message += self.global_timers.send_events[:n_timers]
+        message += self.global_counters.attached_events[:n_counters]
+        message += self.conditions.channels[:n_conditions]
+        message += self.conditions.values[:n_conditions]
+        message += self.global_counters.reset_matrix[:n_states]
+
+        logger.debug("STATE MACHINE MESSAGE: %s", message)
+        return message
+
+    def __message_global_timer_list(self):
+        """
+        :rtype: list(int)
+        """
+        n_states = self.total_states_added
+        return (
+            self.global_timers.triggers_matrix[:n_states]
+            + self.global_timers.cancels_matrix[:n_states]
+            + self.global_timers.onset_matrix[: self.highest_used_global_timer]
+        )
+
+    def __message_32_bits_list(self):
+        """
+        :rtype: list(float)
+        """
+        n_timers = self.highest_used_global_timer
+        cycle_frequency = self.hardware.cycle_frequency
+
+        message = [timer * cycle_frequency for timer in self.state_timers[: self.total_states_added]]
+        for timers_values in (
+            self.global_timers.timers,
+            self.global_timers.on_set_delays,
+            self.global_timers.loop_intervals,
+        ):
+            message += [value * cycle_frequency for value in timers_values[:n_timers]]
+        message += self.global_counters.thresholds[: self.highest_used_global_counter]
+        return message
+
+    def __message_size(self, matrices):
+        n_states = self.total_states_added
+        return (
+            4
+            + n_states  # state timer matrix
+            + sum(n_states + 2 * len(codes) for _, codes, _ in matrices)
+            + 5 * self.highest_used_global_timer  # channels, on/off messages, loop modes and events
+            + self.highest_used_global_counter  # attached events
+            + 2 * self.highest_used_global_condition  # channels and values
+            + n_states  # global counter resets
+        )
+
+    def __message_global_timer_size(self):
+        return 2 * self.total_states_added + self.highest_used_global_timer
+
+    def __message_32_bits_size(self):
+        return (
+            self.total_states_added
+            + 3 * self.highest_used_global_timer
+            + self.highest_used_global_counter
+        )
+
+    def __global_timer_dtype(self):
+        if self.hardware.n_global_timers > 16:
+            return np.uint32
+        elif self.hardware.n_global_timers > 8:
+            return np.uint16
+        else:
+            return np.uint8
+
+    def __write_message(self, message, matrices):
+        """
+        Write the states, transitions, outputs, global timers, global counters and conditions settings
+
+        :param numpy.ndarray message: uint8 buffer of the message size, filled with zeros
+        :param matrices: flattened matrices returned by __flatten_matrices
+        """
+        n_states = self.total_states_added
+        n_timers = self.highest_used_global_timer
+        n_counters = self.highest_used_global_counter
+        n_conditions = self.highest_used_global_condition
+
+        message[:4] = (n_states, n_timers, n_counters, n_conditions)
+        pos = 4
+
         # STATE TIMER MATRIX
         # Send state timer transitions (for all states)
-        tmp = []
-        for i in range(self.total_states_added):
-            tmp += [
-                self.total_states_added
-                if math.isnan(self.state_timer_matrix[i])
-                else self.state_timer_matrix[i]
-            ]
-
-        message += tmp
-        logger.debug("STATE TIMER MATRIX: %s", tmp)
-
-        # INPUT MATRIX
-        # Send event-triggered transitions (where they are different from default)
-        tmp = []
-        for i in range(self.total_states_added):
-
-            state_transitions = self.input_matrix[i]
-            n_transitions = len(state_transitions)
-            tmp += [n_transitions]
-            for transition in state_transitions:
-                tmp += [transition[0]]
-                dest_state = transition[1]
-                tmp += [
-                    self.total_states_added if math.isnan(dest_state) else dest_state
-                ]
-        message += tmp
-        logger.debug("INPUT MATRIX: %s", tmp)
-
-        # OUTPUT MATRIX
-        # Send hardware states (where they are different from default)
-        tmp = []
-        for i in range(self.total_states_added):
-            hw_state = self.output_matrix[i]
-            hw_state = [
-                evt
-                for evt in hw_state
-                if evt[0] < self.hardware.channels.events_positions.globalTimerTrigger
-            ]
-            n_differences = len(hw_state)
-            tmp += [n_differences]
-            for hw_conf in hw_state:
-                tmp += hw_conf[:2]
-        message += tmp
-        logger.debug("OUTPUT MATRIX: %s", tmp)
-
-        # GLOBAL_TIMER_START_MATRIX
-        # Send global timer-start triggered transitions (where they are different from default)
-        tmp = []
-        for i in range(self.total_states_added):
-            state_transitions = self.global_timers.start_matrix[i]
-            n_transitions = len(state_transitions)
-            tmp += [n_transitions]
-            for transition in state_transitions:
-                dest_state = transition[1]
-                tmp += [
-                    transition[0]
-                    - self.hardware.channels.events_positions.globalTimerStart
-                ]
-                tmp += [
-                    self.total_states_added if math.isnan(dest_state) else dest_state
-                ]
-        message += tmp
-        logger.debug("GLOBAL_TIMER_START_MATRIX: %s", tmp)
-
-        # GLOBAL_TIMER_END_MATRIX
-        # Send global timer-end triggered transitions (where they are different from default)
-        tmp = []
-        for i in range(self.total_states_added):
-            state_transitions = self.global_timers.end_matrix[i]
-            n_transitions = len(state_transitions)
-            tmp += [n_transitions]
-            for transition in state_transitions:
-                dest_state = transition[1]
-                tmp += [
-                    transition[0]
-                    - self.hardware.channels.events_positions.globalTimerEnd
-                ]
-                tmp += [
-                    self.total_states_added if math.isnan(dest_state) else dest_state
-                ]
-        message += tmp
-        logger.debug("GLOBAL_TIMER_END_MATRIX: %s", tmp)
-
-        # GLOBAL_COUNTER_MATRIX
-        # Send global counter triggered transitions (where they are different from default)
-        tmp = []
-        for i in range(self.total_states_added):
-            state_transitions = self.global_counters.matrix[i]
-            n_transitions = len(state_transitions)
-            tmp += [n_transitions]
-            for transition in state_transitions:
-                dest_state = transition[1]
-                tmp += [
-                    transition[0]
-                    - self.hardware.channels.events_positions.globalCounter
-                ]
-                tmp += [
-                    self.total_states_added if math.isnan(dest_state) else dest_state
-                ]
-        message += tmp
-        logger.debug("GLOBAL_COUNTER_MATRIX: %s", tmp)
-
-        # CONDITION_MATRIX
-        # Send condition triggered transitions (where they are different from default)
-        tmp = []
-        for i in range(self.total_states_added):
-            state_transitions = self.conditions.matrix[i]
-            n_transitions = len(state_transitions)
-            tmp += [n_transitions]
-            for transition in state_transitions:
-                dest_state = transition[1]
-                tmp += [
-                    transition[0] - self.hardware.channels.events_positions.condition
-                ]
-                tmp += [
-                    self.total_states_added if math.isnan(dest_state) else dest_state
-                ]
-
-        message += tmp
-        logger.debug("CONDITION_MATRIX: %s", tmp)
-
-        # GLOBAL_TIMER_CHANNELS
-        tmp = []
-        for i in range(self.highest_used_global_timer):
-            tmp += [self.global_timers.channels[i]]
-        message += tmp
-        logger.debug("GLOBAL_TIMER_CHANNELS: %s", tmp)
-
-        # GLOBAL_TIMER_ON_MESSAGES
-        tmp = []
-        for i in range(self.highest_used_global_timer):
-            v = self.global_timers.on_messages[i]
-            tmp += [255 if v == 0 else v]
-        message += tmp
-        logger.debug("GLOBAL_TIMER_ON_MESSAGES: %s", tmp)
-
-        # GLOBAL_TIMER_OFF_MESSAGES
-        tmp = []
-        for i in range(self.highest_used_global_timer):
-            v = self.global_timers.off_messages[i]
-            tmp += [255 if v == 0 else v]
-        message += tmp
-        logger.debug("GLOBAL_TIMER_OFF_MESSAGES: %s", tmp)
-
-        # GLOBAL_TIMER_LOOP_MODE
-        tmp = []
-        for i in range(self.highest_used_global_timer):
-            tmp += [self.global_timers.loop_mode[i]]
-        message += tmp
-        logger.debug("GLOBAL_TIMER_LOOP_MODE: %s", tmp)
+        state_timer_matrix = np.array(self.state_timer_matrix[:n_states], dtype=np.float64)
+        message[pos : pos + n_states] = np.where(np.isnan(state_timer_matrix), n_states, state_timer_matrix)
+        logger.debug("STATE TIMER MATRIX: %s", message[pos : pos + n_states])
+        pos += n_states
+
+        # INPUT, OUTPUT, GLOBAL_TIMER_START, GLOBAL_TIMER_END, GLOBAL_COUNTER and CONDITION matrices
+        # Send the transitions and hardware states (where they are different from default)
+        for counts, codes, values in matrices:
+            pos = _write_pairs(message, pos, counts, codes, values)
 
+        # GLOBAL_TIMER_CHANNELS, GLOBAL_TIMER_ON_MESSAGES, GLOBAL_TIMER_OFF_MESSAGES, GLOBAL_TIMER_LOOP_MODE and
         # GLOBAL_TIMER_EVENTS
-        tmp = []
-        for i in range(self.highest_used_global_timer):
-            tmp += [self.global_timers.send_events[i]]
-        message += tmp
-        logger.debug("GLOBAL_TIMER_EVENTS: %s", tmp)
+        message[pos : pos + n_timers] = self.global_timers.channels[:n_timers]
+        pos += n_timers
+        for messages in (self.global_timers.on_messages, self.global_timers.off_messages):
+            values = np.array(messages[:n_timers], dtype=np.int64)
+            message[pos : pos + n_timers] = np.where(values == 0, 255, values)
+            pos += n_timers
+        message[pos : pos + n_timers] = self.global_timers.loop_mode[:n_timers]
+        pos += n_timers
+        message[pos : pos + n_timers] = self.global_timers.send_events[:n_timers]
+        pos += n_timers
 
         # GLOBAL_COUNTER_ATTACHED_EVENTS
-        tmp = []
-        for i in range(self.highest_used_global_counter):
-            tmp += [self.global_counters.attached_events[i]]
-        message += tmp
-        logger.debug("GLOBAL_COUNTER_ATTACHED_EVENTS: %s", tmp)
-
-        # CONDITIONS_CHANNELS
-        tmp = []
-        for i in range(self.highest_used_global_condition):
-            tmp += [self.conditions.channels[i]]
-        message += tmp
-        logger.debug("CONDITIONS_CHANNELS: %s", tmp)
-
-        # CONDITIONS VALUES
-        tmp = []
-        for i in range(self.highest_used_global_condition):
-            tmp += [self.conditions.values[i]]
-        message += tmp
-        logger.debug("CONDITIONS VALUES: %s", tmp)
+        message[pos : pos + n_counters] = self.global_counters.attached_events[:n_counters]
+        pos += n_counters
+
+        # CONDITIONS_CHANNELS and CONDITIONS VALUES
+        message[pos : pos + n_conditions] = self.conditions.channels[:n_conditions]
+        pos += n_conditions
+        message[pos : pos + n_conditions] = self.conditions.values[:n_conditions]
+        pos += n_conditions
 
         # GLOBAL_COUNTER_RESETS
-        tmp = []
-        for i in range(self.total_states_added):
-            tmp += [self.global_counters.reset_matrix[i]]
-        message += tmp
-        logger.debug("GLOBAL_COUNTER_RESETS: %s", tmp)
+        message[pos : pos + n_states] = self.global_counters.reset_matrix[:n_states]
 
-        self.state_timers = self.state_timers[: self.total_states_added]
+        logger.debug("STATE MACHINE MESSAGE: %s", message)
 
-        return ArduinoTypes.get_uint8_array(message)
+    def __write_message_global_timer(self, message):
+        """
+        :param numpy.ndarray message: buffer of the global timer message size
+        """
+        n_states = self.total_states_added
 
-    def build_message_global_timer(self):
+        message[:n_states] = self.global_timers.triggers_matrix[:n_states]
+        message[n_states : 2 * n_states] = self.global_timers.cancels_matrix[:n_states]
+        message[2 * n_states :] = self.global_timers.onset_matrix[: self.highest_used_global_timer]
 
-        message = []
+    def __write_message_32_bits(self, message):
+        """
+        Write the state timers, the global timers durations, onset delays and loop intervals (in cycles) and the
+        global counters thresholds
 
-        for i in range(self.total_states_added):
-            message += (self.global_timers.triggers_matrix[i],)
+        :param numpy.ndarray message: uint32 buffer of the 32 bits message size
+        """
+        n_states = self.total_states_added
+        n_timers = self.highest_used_global_timer
 
-        for i in range(self.total_states_added):
-            message += (self.global_timers.cancels_matrix[i],)
+        values = np.empty(len(message), dtype=np.float64)
+        values[:n_states] = self.state_timers[:n_states]
+        pos = n_states
+        for timers_values in (
+            self.global_timers.timers,
+            self.global_timers.on_set_delays,
+            self.global_timers.loop_intervals,
+        ):
+            values[pos : pos + n_timers] = timers_values[:n_timers]
+            pos += n_timers
+        values[:pos] *= self.hardware.cycle_frequency
+        values[pos:] = self.global_counters.thresholds[: self.highest_used_global_counter]
 
-        for i in range(self.highest_used_global_timer):
-            message += (self.global_timers.onset_matrix[i],)
+        message[:] = values
 
-        if self.hardware.n_global_timers > 16:
-            return ArduinoTypes.get_uint32_array(message)
-        elif self.hardware.n_global_timers > 8:
-            return ArduinoTypes.get_uint16_array(message)
-        else:
-            return ArduinoTypes.get_uint8_array(message)
 
-    def build_message_32_bits(self):
-        """
-        Builds a 32 bit message to send to Bpod box
+_NO_PAIRS = np.empty(0, dtype=np.int64)
 
-        :rtype: list(float)
-        """
-        # TODO find how many global timers are used
 
-        """
-        thirty_two_bit_message = [i * self.hardware.cycle_frequency for i in self.state_timers] + \
-                                 [i * self.hardware.cycle_frequency for i in self.global_timers.timers] + \
-                                 [i * self.hardware.cycle_frequency for i in self.global_timers.on_set_delays] + \
-                                 [i * self.hardware.cycle_frequency for i in self.global_timers.loop_intervals] + \
-                                 self.global_counters.thresholds"""
-
-        used_timers = range(self.highest_used_global_timer)
-        used_counters = range(self.highest_used_global_counter)
-
-        thirty_two_bit_message = (
-            [t * self.hardware.cycle_frequency for t in self.state_timers]
-            + [
-                self.global_timers.timers[i] * self.hardware.cycle_frequency
-                for i in used_timers
-            ]
-            + [
-                self.global_timers.on_set_delays[i] * self.hardware.cycle_frequency
-                for i in used_timers
-            ]
-            + [
-                self.global_timers.loop_intervals[i] * self.hardware.cycle_frequency
-                for i in used_timers
-            ]
-            + [self.global_counters.thresholds[i] for i in used_counters]
-        )
+def _flatten_pairs(rows, code_offset=0, exit_state=None, max_code=None):
+    """
+    Flatten a matrix with a list of (code, value) pairs per state
+
+    :param list rows: pairs of each state
+    :param int code_offset: value subtracted from the codes
+    :param int exit_state: value replacing NaN values (exit destinations), None for matrices without destinations
+    :param int max_code: keep only the pairs with a lower code
+    :return: number of pairs per state, codes and values
+    :rtype: tuple(numpy.ndarray)
+    """
+    counts = np.fromiter(map(len, rows), dtype=np.int64, count=len(rows))
+    n_pairs = int(counts.sum())
+    if n_pairs == 0:
+        return counts, _NO_PAIRS, _NO_PAIRS
+
+    pairs = np.fromiter(chain.from_iterable(chain.from_iterable(rows)), dtype=np.float64, count=2 * n_pairs)
+    codes, values = pairs[0::2], pairs[1::2]
+
+    if max_code is not None:
+        keep = codes < max_code
+        if not keep.all():
+            states = np.repeat(np.arange(len(rows)), counts)
+            counts = np.bincount(states[keep], minlength=len(rows))
+            codes, values = codes[keep], values[keep]
+
+    if exit_state is not None:
+        values = np.where(np.isnan(values), exit_state, values)
+
+    return counts, codes.astype(np.int64) - code_offset, values.astype(np.int64)
+
+
+def _append_pairs(message, rows, code_offset=0, exit_state=None, max_code=None):
+    """
+    Append a matrix with a list of (code, value) pairs per state as, for each state, the number of pairs followed
+    by the pairs (see :func:`_flatten_pairs` for the parameters)
+
+    :param list message: message the matrix is appended to
+    """
+    for row in rows:
+        if max_code is not None:
+            row = [pair for pair in row if pair[0] < max_code]
+        message.append(len(row))
+        for code, value in row:
+            message.append(code - code_offset)
+            message.append(exit_state if exit_state is not None and value != value else value)
+
+
+def _write_pairs(message, pos, counts, codes, values):
+    """
+    Write a flattened matrix as, for each state, the number of pairs followed by the pairs.
+    The message must be filled with zeros, the states without pairs are not written.
+
+    :return: position after the matrix
+    :rtype: int
+    """
+    if len(codes) == 0:
+        return pos + len(counts)
+
+    sizes = 1 + 2 * counts
+    starts = pos + np.cumsum(sizes) - sizes
+    message[starts] = counts
+
+    # position of each pair within the pairs of its state
+    ranks = np.arange(len(codes)) - np.repeat(np.cumsum(counts) - counts, counts)
+    pairs_pos = np.repeat(starts + 1, counts) + 2 * ranks
+    message[pairs_pos] = codes
+    message[pairs_pos + 1] = values
 
-        return ArduinoTypes.get_uint32_array(thirty_two_bit_message)
+    return pos + len(counts) + 2 * len(codes)
 
 
 class StateMachineBuilderError(Exception):
@@ -14,6 +14,7 @@ class StateMachineRunner(StateMachineBuilder):
 
     :ivar bool is_running: Whether this state machine is being run on bpod hardware
     :ivar int current_state: Holds state machine current state while running
+    :ivar list(dict) transitions_table: destination state of each event id, for each state (see :meth:`build_transitions_table`)
     """
 
     def __init__(self, bpod):
@@ -23,6 +24,41 @@ class StateMachineRunner(StateMachineBuilder):
 
         self.current_state = 0  # type: int
 
+        self.transitions_table = None  # type: list(dict)
+
+    def build_transitions_table(self):
+        """
+        Compile the state transitions into one {event id: destination state} dictionary per state, so the state
+        changes can be followed on the host with one lookup per event.
+
+        When an event is handled by several matrices, the destination follows the precedence used while running:
+        input matrix, state timer, global timers start matrix and global timers end matrix.
+        The destinations are the ones of the matrices: NaN to exit and 255 for the back signal.
+
+        .. note:: Must be called after :meth:`update_state_numbers`.
+        """
+        tup = self.hardware.channels.events_positions.Tup
+
+        table = []
+        for state in range(self.total_states_added):
+            transitions = {}
+            for event_id, destination in self.input_matrix[state]:
+                transitions.setdefault(event_id, destination)
+
+            # a state timer pointing to the state itself does not change the state
+            state_timer_destination = self.state_timer_matrix[state]
+            if state_timer_destination != state:
+                transitions.setdefault(tup, state_timer_destination)
+
+            for event_id, destination in self.global_timers.start_matrix[state]:
+                transitions.setdefault(event_id, destination)
+            for event_id, destination in self.global_timers.end_matrix[state]:
+                transitions.setdefault(event_id, destination)
+
+            table.append(transitions)
+
+        self.transitions_table = table
+
     #########################################
     ############## PROPERTIES ###############
     #########################################
@@ -0,0 +1,180 @@
+# !/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import copy
+import logging
+
+from pybpodapi.state_machine import StateMachine
+
+logger = logging.getLogger(__name__)
+
+
+class StateMachineTemplate(object):
+    """
+    State machine built once and instantiated for each trial with new timer values.
+
+    Some state timers, global timer durations and global counter thresholds are declared as parameters.
+    The instances created by :meth:`create` share the states, transitions and outputs of the template, which are
+    encoded only once, so sending an instance only encodes again the 32 bits message
+    (see :meth:`pybpodapi.state_machine.state_machine_builder.StateMachineBuilder.build_message_32_bits`).
+    The state machine cannot be modified once it is used as a template.
+
+    Example:
+
+    .. code-block:: python
+
+        sma = StateMachine(my_bpod)
+        sma.set_global_timer(1, timer_duration=5)
+        sma.add_state(state_name='WaitForPoke', state_timer=1, state_change_conditions={'Port1In': 'Reward', 'Tup': 'exit'})
+        sma.add_state(state_name='Reward', state_timer=0.1, state_change_conditions={'Tup': 'exit'}, output_actions=[('Valve', 1)])
+
+        template = StateMachineTemplate(sma)
+        template.add_state_timer_parameter('reward_time', 'Reward')
+        template.add_global_timer_parameter('trial_duration', 1)
+
+        for i in range(n_trials):
+            trial_sma = template.create(reward_time=rewards[i], trial_duration=5)
+            my_bpod.send_state_machine(trial_sma)
+            my_bpod.run_state_machine(trial_sma)
+
+    .. note:: The global timers and counters sent to Bpod are the ones used by the template. A parameter set to 0
+              does not remove its global timer or counter from the state machine.
+    """
+
+    STATE_TIMER = "state_timer"
+    GLOBAL_TIMER = "global_timer"
+    GLOBAL_COUNTER = "global_counter"
+
+    def __init__(self, sma):
+        """
+        :param StateMachine sma: state machine with all its states added, used as template
+        """
+        self.state_machine = sma
+
+        # name -> (kind, index)
+        self._parameters = {}
+
+        sma.update_state_numbers()
+        sma.build_transitions_table()
+        # states, transitions, outputs and global timers triggers do not change between instances
+        self._message = sma.build_message() + sma.build_message_global_timer()
+        sma.read_only_reason = "it is used as a template"
+
+    @property
+    def parameters(self):
+        """
+        Names of the parameters
+
+        :rtype: list(str)
+        """
+        return list(self._parameters)
+
+    def add_state_timer_parameter(self, name, state_name):
+        """
+        Declare the timer of a state as a parameter
+
+        :param str name: parameter name
+        :param str state_name: state of the template
+        """
+        try:
+            state_number = self.state_machine.state_names.index(state_name)
+        except ValueError:
+            raise StateMachineTemplateError("Error: {0} is not a state of the template.".format(state_name))
+        self.__add_parameter(name, self.STATE_TIMER, state_number)
+
+    def add_global_timer_parameter(self, name, timer_id):
+        """
+        Declare the duration of a global timer as a parameter
+
+        :param str name: parameter name
+        :param int timer_id: number of the global timer (starting at 1), used by the template
+        """
+        if not 1 <= timer_id <= self.state_machine.highest_used_global_timer:
+            raise StateMachineTemplateError("Error: global timer {0} is not used by the template.".format(timer_id))
+        self.__add_parameter(name, self.GLOBAL_TIMER, timer_id - 1)
+
+    def add_global_counter_parameter(self, name, counter_number):
+        """
+        Declare the threshold of a global counter as a parameter
+
+        :param str name: parameter name
+        :param int counter_number: number of the global counter (starting at 1), used by the template
+        """
+        if not 1 <= counter_number <= self.state_machine.highest_used_global_counter:
+            raise StateMachineTemplateError(
+                "Error: global counter {0} is not used by the template.".format(counter_number)
+            )
+        self.__add_parameter(name, self.GLOBAL_COUNTER, counter_number - 1)
+
+    def create(self, **values):
+        """
+        Create a state machine with the given parameter values, the others keep the values of the template
+
+        :param values: parameter name -> value (seconds for the timers)
+        :rtype: StateMachineInstance
+        """
+        template = self.state_machine
+
+        sma = StateMachineInstance.__new__(StateMachineInstance)
+        sma.__dict__.update(template.__dict__)
+        sma.template_message = self._message
+        sma.read_only_reason = "it was created from a template"
+        sma.is_running = False
+        sma.current_state = 0
+
+        # only the data changed by the parameters is copied
+        sma.state_timers = list(template.state_timers)
+        sma.global_timers = copy.copy(template.global_timers)
+        sma.global_timers.timers = list(template.global_timers.timers)
+        sma.global_counters = copy.copy(template.global_counters)
+        sma.global_counters.thresholds = list(template.global_counters.thresholds)
+
+        for name, value in values.items():
+            try:
+                kind, index = self._parameters[name]
+            except KeyError:
+                raise StateMachineTemplateError("Error: {0} is not a parameter of the template.".format(name))
+
+            if kind == self.STATE_TIMER:
+                sma.state_timers[index] = value
+            elif kind == self.GLOBAL_TIMER:
+                sma.global_timers.timers[index] = value
+            else:
+                sma.global_counters.thresholds[index] = value
+
+        return sma
+
+    def __add_parameter(self, name, kind, index):
+        if name in self._parameters:
+            raise StateMachineTemplateError("Error: parameter {0} already exists.".format(name))
+        self._parameters[name] = (kind, index)
+
+
+class StateMachineInstance(StateMachine):
+    """
+    State machine created by :meth:`StateMachineTemplate.create`.
+
+    It shares the states, transitions and outputs of its template, only its timers and global counters thresholds
+    are encoded when it is sent to Bpod.
+
+    :ivar bytes template_message: encoded state machine of the template, before the 32 bits message
+
+    .. note:: The states, transitions and outputs are shared with the template and the other instances, so the
+              template and its instances cannot be modified. Build a new state machine and a new template to
+              change them.
+    """
+
+    def update_state_numbers(self):
+        # the state numbers were resolved in the template
+        pass
+
+    def build_transitions_table(self):
+        # the transitions table is shared with the template
+        pass
+
+    def build_body(self):
+        return self.template_message + self.build_message_32_bits()
+
+
+class StateMachineTemplateError(Exception):
+    pass
@@ -1,10 +1,59 @@
-import dateutil
+from datetime import datetime
 
 # import pendulum
 # import ciso8601
 
 
 def parse(date: str):
-    return dateutil.parser.parse(date)
+    """
+    Parse a date. The format of str(datetime), used by the session files, is parsed without dateutil.
+
+    :rtype: datetime
+    """
+    try:
+        return datetime.fromisoformat(date)
+    except (ValueError, TypeError):
+        pass
+
+    value = _parse_fixed_format(date)
+    if value is None:
+        # dateutil is only needed by the other formats
+        import dateutil.parser
+
+        value = dateutil.parser.parse(date)
+    return value
     # return pendulum.parse(date)
     # return ciso8601.parse_datetime(date)
+
+
+def _parse_fixed_format(date):
+    """
+    Parse a date in the format "YYYY-MM-DD HH:MM:SS[.f]", with any number of digits in the fraction of second
+    (before Python 3.11, datetime.fromisoformat only accepts 3 or 6 digits)
+
+    :return: the datetime or None if the date has another format
+    """
+    if (
+        not isinstance(date, str)
+        or len(date) < 19
+        or date[4] != "-"
+        or date[7] != "-"
+        or date[10] not in " T"
+        or date[13] != ":"
+        or date[16] != ":"
+    ):
+        return None
+
+    try:
+        seconds = datetime(
+            int(date[0:4]), int(date[5:7]), int(date[8:10]), int(date[11:13]), int(date[14:16]), int(date[17:19])
+        )
+    except ValueError:
+        return None
+
+    fraction = date[20:]
+    if len(date) == 19:
+        return seconds
+    if date[19] != "." or not fraction.isdigit():
+        return None
+    return seconds.replace(microsecond=int(fraction[:6].ljust(6, "0")))
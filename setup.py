@@ -25,7 +25,7 @@ setup(
     url="https://github.com/pybpod/pybpod-api",
     include_package_data=True,
     packages=find_packages(
-        exclude=["contrib", "docs", "tests", "examples", "deploy", "reports"]
+        exclude=["contrib", "docs", "tests", "examples", "deploy", "reports", "benchmarks"]
     ),
     install_requires=requirements,
 )